@@ -7,6 +7,10 @@ alter table public.articles
   add column if not exists is_favorite boolean default false,
   add column if not exists favorite_analysis text;
 
+-- Unique index on link: backs the on_conflict=link upsert and makes the
+-- existing-link pre-check an index-only scan
+create unique index if not exists idx_articles_link on public.articles (link);
+
 -- RLS policies for public favorite update (anon key)
 -- Enable RLS if not already enabled
 alter table public.articles enable row level security;
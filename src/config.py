@@ -21,27 +21,31 @@ if os.path.exists(dotenv_path):
         # 检测到 BOM，移除它
         with open(dotenv_path, 'wb') as f:
             f.write(content_bytes[3:])
-        print(f"Debug: Removed UTF-8 BOM from .env file")
+        print("Debug: Removed UTF-8 BOM from .env file")
 
 # 3. 显式加载 .env 文件
-print(f"Debug: Attempting to load .env from: {dotenv_path}")
 load_dotenv(dotenv_path)
 
-# 3. 调试输出：再次显示加载后环境变量的相关键，作为最终检查
-print("--- Debug: Environment after .env load (final verification) ---")
-# 检查关键变量是否存在于 os.environ 中
-supabase_url_env = os.environ.get("SUPABASE_URL")
-supabase_key_env = os.environ.get("SUPABASE_KEY")
-supabase_service_key_env = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
-supabase_anon_key_env = os.environ.get("SUPABASE_ANON_KEY")
-openai_key_env = os.environ.get("OPENAI_API_KEY")
+# 调试输出默认关闭：这些 print 每次导入都会执行（还会泄露密钥前缀到日志），
+# 需要排查 .env 加载问题时设 DEBUG=True 再打开
+_CONFIG_DEBUG = os.environ.get("DEBUG") == "True"
 
-print(f"  SUPABASE_URL = {supabase_url_env[:40] if supabase_url_env else 'None'}...")
-print(f"  SUPABASE_KEY (legacy) = {supabase_key_env[:16] if supabase_key_env else 'None'}...")
-print(f"  SUPABASE_SERVICE_ROLE_KEY = {'Set' if supabase_service_key_env else 'Not set'}")
-print(f"  SUPABASE_ANON_KEY = {'Set' if supabase_anon_key_env else 'Not set'}")
-print(f"  OPENAI_API_KEY = {openai_key_env[:40] if openai_key_env else 'None'}...")
-print("------------------------------------------------------------------")
+if _CONFIG_DEBUG:
+    print(f"Debug: Attempting to load .env from: {dotenv_path}")
+    print("--- Debug: Environment after .env load (final verification) ---")
+    # 检查关键变量是否存在于 os.environ 中
+    supabase_url_env = os.environ.get("SUPABASE_URL")
+    supabase_key_env = os.environ.get("SUPABASE_KEY")
+    supabase_service_key_env = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+    supabase_anon_key_env = os.environ.get("SUPABASE_ANON_KEY")
+    openai_key_env = os.environ.get("OPENAI_API_KEY")
+
+    print(f"  SUPABASE_URL = {supabase_url_env[:40] if supabase_url_env else 'None'}...")
+    print(f"  SUPABASE_KEY (legacy) = {supabase_key_env[:16] if supabase_key_env else 'None'}...")
+    print(f"  SUPABASE_SERVICE_ROLE_KEY = {'Set' if supabase_service_key_env else 'Not set'}")
+    print(f"  SUPABASE_ANON_KEY = {'Set' if supabase_anon_key_env else 'Not set'}")
+    print(f"  OPENAI_API_KEY = {openai_key_env[:40] if openai_key_env else 'None'}...")
+    print("------------------------------------------------------------------")
 
 
 class Settings:
@@ -84,7 +88,8 @@ class Settings:
         self.SUPABASE_TABLE_ARTICLES = os.environ.get("SUPABASE_TABLE_ARTICLES", "articles")
         
         # Log which key type is being used
-        print(f"Debug: Using Supabase key type: {self._supabase_key_type}")
+        if _CONFIG_DEBUG:
+            print(f"Debug: Using Supabase key type: {self._supabase_key_type}")
 
         # Scraper Configuration
         self.ARXIV_CATEGORIES = ['cs.AI', 'cs.LG', 'cs.CL']  # arXiv 查询类别
@@ -145,6 +150,7 @@ SERPER_API_KEY = settings.SERPER_API_KEY
 RESEND_API_KEY = settings.RESEND_API_KEY
 
 # 调试：输出最终加载的关键值
-print(f"Debug: Final Loaded SUPABASE_URL (from settings object): {settings.SUPABASE_URL[:40]}...")
-print(f"Debug: Final Loaded SUPABASE_KEY (from settings object): {settings.SUPABASE_KEY[:16]}...")
-print(f"Debug: Supabase Key Type: {settings.supabase_key_type}")
+if _CONFIG_DEBUG:
+    print(f"Debug: Final Loaded SUPABASE_URL (from settings object): {settings.SUPABASE_URL[:40]}...")
+    print(f"Debug: Final Loaded SUPABASE_KEY (from settings object): {settings.SUPABASE_KEY[:16]}...")
+    print(f"Debug: Supabase Key Type: {settings.supabase_key_type}")
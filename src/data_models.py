@@ -1,7 +1,30 @@
 from datetime import datetime, date
 from typing import List, Optional, Dict, Any, Union
 
-from pydantic import BaseModel, Field, HttpUrl, validator
+from pydantic import BaseModel, Field, HttpUrl, PrivateAttr, validator
+
+# dateutil 导入提升到模块级：之前在日期校验器里每次失败路径都重新 import。
+# 未安装时保持原有的静默回退
+try:
+    from dateutil import tz as _dateutil_tz
+    from dateutil.parser import parse as _dateutil_parse
+except ImportError:
+    _dateutil_tz = None
+    _dateutil_parse = None
+
+# RSS 日期里常见的时区缩写；dateutil 默认不识别这些缩写，
+# 不给 tzinfos 时会丢弃时区信息
+_TZINFOS = {
+    abbr: _dateutil_tz.gettz(zone)
+    for abbr, zone in {
+        "UT": "UTC", "GMT": "UTC", "UTC": "UTC",
+        "EST": "US/Eastern", "EDT": "US/Eastern",
+        "CST": "US/Central", "CDT": "US/Central",
+        "MST": "US/Mountain", "MDT": "US/Mountain",
+        "PST": "US/Pacific", "PDT": "US/Pacific",
+    }.items()
+} if _dateutil_tz is not None else None
+
 
 class Article(BaseModel):
     """
@@ -37,7 +60,18 @@ class Article(BaseModel):
     # Metadata for internal use, not necessarily for display
     created_at: datetime = Field(default_factory=datetime.utcnow, description="Timestamp when the article record was created in the system.")
     updated_at: datetime = Field(default_factory=datetime.utcnow, description="Timestamp when the article record was last updated in the system.")
-    
+
+    # 缓存 str(link) 的结果：HttpUrl.__str__ 每次都会重新渲染 URL，
+    # 而日志、去重、upsert 等路径会反复用到同一个字符串。
+    _link_str: Optional[str] = PrivateAttr(default=None)
+
+    @property
+    def link_str(self) -> str:
+        """Cached string form of ``link`` (HttpUrl re-renders on every str())."""
+        if self._link_str is None:
+            self._link_str = str(self.link)
+        return self._link_str
+
     class Config:
         json_encoders = {
             datetime: lambda v: v.isoformat(),
@@ -68,14 +102,11 @@ class Article(BaseModel):
                 except ValueError:
                     pass
             # Try parsing with dateutil if other formats fail
-            try:
-                from dateutil.parser import parse
-                return parse(v)
-            except ImportError:
-                # Fallback if dateutil is not installed
-                pass
-            except Exception:
-                pass # Let Pydantic's HttpUrl handle other invalid cases
+            if _dateutil_parse is not None:
+                try:
+                    return _dateutil_parse(v, tzinfos=_TZINFOS)
+                except Exception:
+                    pass # Let Pydantic's HttpUrl handle other invalid cases
         raise ValueError(f"Could not parse '{v}' into a datetime object.")
 
     @staticmethod
@@ -1,8 +1,24 @@
+# 注解推迟求值：函数签名可以引用文件后部才定义的类（如 _TitleDeduper）
+from __future__ import annotations
+
 import asyncio
+import functools
+import heapq
+import itertools
 import logging
+import logging.config
 import os
-from datetime import datetime, timedelta
-from typing import List, AsyncIterator
+import re
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+# orjson 解析大 JSON 明显快于标准库；未安装时退回 stdlib json
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Import the updated settings object
 from src.config import settings
@@ -15,6 +31,7 @@ from src.scrapers.rss_scraper import RSSScraper
 from src.scrapers.serper_news_scraper import SerperNewsScraper
 
 # Corrected NLP processor import
+from src import nlp_processor as nlp_processor_module
 from src.nlp_processor import process_articles_batch as nlp_process_articles_batch
 
 from src.email_sender import send_daily_email
@@ -24,25 +41,98 @@ from src.nlp_processor import generate_favorite_analysis
 from src.display_module import DisplayModule
 
 # --- Logging Configuration ---
-# Ensure DEBUG level is visible for detailed field isolation debugging
-log_level = logging.DEBUG if settings.DEBUG else logging.INFO
-logging.basicConfig(
-    level=log_level,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler()
-    ]
-)
-# Set specific loggers to appropriate levels
-logging.getLogger('httpx').setLevel(logging.WARNING)
-logging.getLogger('httpcore').setLevel(logging.WARNING)
-logging.getLogger('asyncio').setLevel(logging.WARNING)
-# Allow supabase and our modules to show DEBUG logs when DEBUG is enabled
-logging.getLogger('supabase').setLevel(logging.DEBUG if settings.DEBUG else logging.INFO)
-logging.getLogger('src.supabase_manager').setLevel(logging.DEBUG if settings.DEBUG else logging.INFO)
+# Ensure DEBUG level is visible for detailed field isolation debugging.
+# 一次 dictConfig 完成根 logger、格式和各子 logger 级别的配置，
+# 避免 basicConfig + 多次 getLogger().setLevel 的重复开销。
+_level_name = 'DEBUG' if settings.DEBUG else 'INFO'
+logging.config.dictConfig({
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'standard': {'format': '%(asctime)s - %(name)s - %(levelname)s - %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'standard'},
+    },
+    'root': {'level': _level_name, 'handlers': ['console']},
+    'loggers': {
+        'httpx': {'level': 'WARNING'},
+        'httpcore': {'level': 'WARNING'},
+        'asyncio': {'level': 'WARNING'},
+        # Allow supabase and our modules to show DEBUG logs when DEBUG is enabled
+        'supabase': {'level': _level_name},
+        'src.supabase_manager': {'level': _level_name},
+    },
+})
 
 logger = logging.getLogger(__name__)
-logger.setLevel(log_level)  # Explicitly set logger level
+
+# Serper 新闻搜索查询（模块级常量，避免每次运行重新拼接）
+SERPER_NEWS_QUERY = "AI news OR artificial intelligence OR LLM"
+
+# 默认 RSS 源（配置文件缺失/损坏时的回退）
+_DEFAULT_RSS_FEEDS = (
+    {'name': 'OpenAI Blog', 'url': 'https://openai.com/blog/rss'},
+    {'name': 'Google Research Blog', 'url': 'https://blog.google/technology/ai/rss'},
+)
+
+
+@functools.lru_cache(maxsize=1)
+def _load_rss_feed_configs() -> tuple:
+    """加载 RSS 源配置；结果按进程缓存，重复调用不再读盘解析。"""
+    import json
+    from pathlib import Path
+    rss_feeds_path = Path(__file__).parent / 'data' / 'rss_feeds.json'
+    try:
+        with open(rss_feeds_path, 'rb') as f:
+            raw_feeds = f.read()
+        rss_feeds_data = orjson.loads(raw_feeds) if orjson else json.loads(raw_feeds)
+        rss_feed_configs = tuple(
+            {'name': feed['name'], 'url': feed['url']}
+            for feed in rss_feeds_data
+        )
+        logger.info(f"Loaded {len(rss_feed_configs)} RSS feeds from {rss_feeds_path}")
+        return rss_feed_configs
+    except FileNotFoundError:
+        logger.warning(f"RSS feeds config file not found at {rss_feeds_path}, using default feeds")
+        return _DEFAULT_RSS_FEEDS
+    except Exception as e:
+        logger.error(f"Error loading RSS feeds config: {e}, using default feeds")
+        return _DEFAULT_RSS_FEEDS
+
+
+@functools.lru_cache(maxsize=1)
+def _get_display_module() -> DisplayModule:
+    """DisplayModule 无状态，进程内复用一个实例即可。"""
+    return DisplayModule()
+
+
+@functools.lru_cache(maxsize=1)
+def _get_supabase_manager():
+    """
+    懒加载的 SupabaseManager 单例。
+
+    构造时会拉取表结构（一次网络往返），进程内重复运行不应重复付这笔
+    开销；初始化失败时缓存 None，后续调用不再重试。
+    """
+    if not (settings.SUPABASE_URL and settings.SUPABASE_KEY):
+        logger.warning("Supabase URL or Key not configured. Supabase operations will be skipped.")
+        return None
+    try:
+        # Use service_role key by default for backend operations (bypasses RLS)
+        manager = SupabaseManager(use_service_role=True)
+    except Exception as e:
+        logger.error(f"Failed to initialize SupabaseManager: {e}", exc_info=True)
+        return None
+    key_type = settings.supabase_key_type
+    logger.info(f"SupabaseManager initialized with {key_type} key.")
+    if 'service_role' in key_type.lower():
+        logger.info("Using service_role key - should bypass RLS policies.")
+    else:
+        logger.warning("Using non-service_role key - operations may be blocked by RLS policies.")
+        logger.warning("Consider setting SUPABASE_SERVICE_ROLE_KEY in .env file.")
+    return manager
+
 
 # --- Main Scraper Logic ---
 async def _process_articles_with_nlp(articles: List[Article]) -> List[Article]:
@@ -65,22 +155,25 @@ async def _process_articles_with_nlp(articles: List[Article]) -> List[Article]:
 
     # Verify article object types and attributes after NLP
     if processed_articles:
-        sample_article = processed_articles[0]
-        logger.info(f"Sample processed article type: {type(sample_article)}")
-        logger.info(f"Sample processed article attributes (first article):")
-        logger.info(f"  Title: '{sample_article.title}'")
-        logger.info(f"  Link: '{str(sample_article.link)}'")
-        logger.info(f"  Summary: '{sample_article.summary[:100] if sample_article.summary else 'N/A'}...'")
-        logger.info(f"  Tags: {sample_article.tags}")
-        logger.info(f"  Main Tags: {sample_article.main_tags}")
-        logger.info(f"  Entities: {sample_article.entities}")
-        # Validate key fields
-        missing_fields = []
-        for a in processed_articles:
-            if not a.title or not a.link or not a.published:
-                missing_fields.append(str(a.link))
+        # 逐字段采样 dump 只在 DEBUG 下渲染：f-string 在 INFO 运行时
+        # 也会为每个批次做字符串化/切片，先判级别再格式化
+        if logger.isEnabledFor(logging.DEBUG):
+            sample_article = processed_articles[0]
+            logger.debug(f"Sample processed article type: {type(sample_article)}")
+            logger.debug(f"Sample processed article attributes (first article):")
+            logger.debug(f"  Title: '{sample_article.title}'")
+            logger.debug(f"  Link: '{sample_article.link_str}'")
+            logger.debug(f"  Summary: '{sample_article.summary[:100] if sample_article.summary else 'N/A'}...'")
+            logger.debug(f"  Tags: {sample_article.tags}")
+            logger.debug(f"  Main Tags: {sample_article.main_tags}")
+            logger.debug(f"  Entities: {sample_article.entities}")
+        # Validate key fields: 只取前 3 个缺字段样本用于告警，避免为全部缺陷文章做 URL 字符串化
+        missing_fields = list(itertools.islice(
+            (a.link_str for a in processed_articles if not (a.title and a.link and a.published)),
+            3,
+        ))
         if missing_fields:
-            logger.warning(f"Some processed articles are missing 'title', 'link', or 'published' fields: {missing_fields[:3]}... This might affect Supabase upsert.")
+            logger.warning(f"Some processed articles are missing 'title', 'link', or 'published' fields: {missing_fields}... This might affect Supabase upsert.")
     else:
         logger.warning("No articles remained after NLP processing. This might indicate an issue with nlp_process_articles_batch or filtering.")
         return []
@@ -90,130 +183,100 @@ async def _process_articles_with_nlp(articles: List[Article]) -> List[Article]:
 
 
 async def main():
-    start_time = datetime.now()
+    # 使用单调时钟计时，避免墙钟跳变/时区调整影响耗时统计
+    start_time = time.perf_counter()
     logger.info("Starting main scraper and processing pipeline...")
 
-    # Initialize SupabaseManager
-    supabase_manager = None
+    # 预热 NLP 后端（客户端构建/配置校验），把冷启动挪到抓取前的固定开销里
     try:
-        if settings.SUPABASE_URL and settings.SUPABASE_KEY:
-            # Use service_role key by default for backend operations (bypasses RLS)
-            supabase_manager = SupabaseManager(use_service_role=True)
-            logger.info(f"SupabaseManager initialized with {settings.supabase_key_type} key.")
-            if 'service_role' in settings.supabase_key_type.lower():
-                logger.info("Using service_role key - should bypass RLS policies.")
-            else:
-                logger.warning("Using non-service_role key - operations may be blocked by RLS policies.")
-                logger.warning("Consider setting SUPABASE_SERVICE_ROLE_KEY in .env file.")
-        else:
-            logger.warning("Supabase URL or Key not configured. Supabase operations will be skipped.")
+        await asyncio.to_thread(nlp_processor_module.warmup)
     except Exception as e:
-        logger.error(f"Failed to initialize SupabaseManager: {e}", exc_info=True)
-        supabase_manager = None # Ensure it's None if init fails
+        logger.warning(f"NLP warmup failed (will retry lazily on first batch): {e}")
+
+    # Initialize SupabaseManager（懒加载单例，重复运行复用实例与表结构缓存）
+    supabase_manager = _get_supabase_manager()
+    # 后台预热 manager 自己连接池里的 TLS 连接，与抓取阶段重叠
+    # （初始化失败时返回 None，降级运行，跟其它使用点一样要判空）
+    if supabase_manager is not None:
+        supabase_manager.warm_connection()
 
     # Determine date range for scraping
-    end_date = datetime.now()
+    end_date = datetime.now(timezone.utc)
     start_date = end_date - timedelta(days=settings.DAYS_AGO)
     logger.info(f"Scraping articles from {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}")
 
-    # Load RSS feed configs
-    import json
-    from pathlib import Path
-    rss_feeds_path = Path(__file__).parent / 'data' / 'rss_feeds.json'
-    try:
-        with open(rss_feeds_path, 'r', encoding='utf-8') as f:
-            rss_feeds_data = json.load(f)
-        rss_feed_configs = [
-            {'name': feed['name'], 'url': feed['url']}
-            for feed in rss_feeds_data
-        ]
-        logger.info(f"Loaded {len(rss_feed_configs)} RSS feeds from {rss_feeds_path}")
-    except FileNotFoundError:
-        logger.warning(f"RSS feeds config file not found at {rss_feeds_path}, using default feeds")
-        rss_feed_configs = [
-            {'name': 'OpenAI Blog', 'url': 'https://openai.com/blog/rss'},
-            {'name': 'Google Research Blog', 'url': 'https://blog.google/technology/ai/rss'},
-        ]
-    except Exception as e:
-        logger.error(f"Error loading RSS feeds config: {e}, using default feeds")
-        rss_feed_configs = [
-            {'name': 'OpenAI Blog', 'url': 'https://openai.com/blog/rss'},
-            {'name': 'Google Research Blog', 'url': 'https://blog.google/technology/ai/rss'},
-        ]
+    # Load RSS feed configs（进程内缓存，重复运行不再重新读盘解析）
+    rss_feed_configs = _load_rss_feed_configs()
 
     # Initialize scrapers
     all_articles_collected: List[Article] = [] # Changed to store Article objects directly
     logger.info("Starting scrapers concurrently...")
 
+    nlp_tasks: List[asyncio.Task] = []
+    seen_links: set = set()           # 跨抓取源共享的 URL 去重集合
+    title_deduper = _TitleDeduper()   # 跨抓取源共享的标题相似度去重器
     scraper_tasks = []
-    
+
     # ArxivScraper
     arxiv_scraper = ArxivScraper(
         query_categories=settings.ARXIV_CATEGORIES,
         max_results_per_category=settings.ARXIV_MAX_RESULTS_PER_CATEGORY
     )
-    arxiv_task = arxiv_scraper.scrape_articles(days_ago=settings.DAYS_AGO)
+    arxiv_task = _scrape_then_process(
+        arxiv_scraper.scrape_articles(days_ago=settings.DAYS_AGO),
+        nlp_tasks, seen_links, title_deduper,
+    )
     scraper_tasks.append(arxiv_task)
     logger.info(f"ArxivScraper task created for categories: {settings.ARXIV_CATEGORIES}")
-    
-    # RSSScraper
+
+    # RSSScraper：流式消费，文章经队列分批进入 NLP，不等所有 feed 抓完
     rss_scraper = RSSScraper(
         feed_configs=rss_feed_configs,
         max_entries_per_feed=settings.MAX_ARTICLES_PER_FEED,
         skip_full_content_for_arxiv=True
     )
-    rss_task = collect_from_async_iterator(
-        rss_scraper.scrape_articles(days_ago=settings.DAYS_AGO, fetch_full_content=True)
+    rss_task = _stream_rss_articles(
+        rss_scraper, settings.DAYS_AGO, nlp_tasks, seen_links, title_deduper,
+        settings.NLP_BATCH_SIZE,
     )
     scraper_tasks.append(rss_task)
     logger.info(f"RSSScraper task created for {len(rss_feed_configs)} feeds")
-    
-    # SerperNewsScraper
-    try:
-        serper_scraper = SerperNewsScraper()
-        serper_results = serper_scraper.search("AI news OR artificial intelligence OR LLM", num=20)
-        serper_articles: List[Article] = []
-        for item in serper_results:
-            raw = {
-                "title": item.get("title"),
-                "link": item.get("link"),
-                "published": item.get("date") or datetime.utcnow(),
-                "source": item.get("source") or "Serper News",
-                "summary": item.get("snippet")
-            }
-            try:
-                serper_articles.append(Article.from_raw_article(raw))
-            except Exception as e:
-                logger.warning(f"Serper item conversion failed: {e}")
-        scraper_tasks.append(asyncio.sleep(0, result=serper_articles))
-        logger.info(f"SerperNewsScraper collected {len(serper_articles)} items")
-    except Exception as e:
-        logger.warning(f"SerperNewsScraper skipped due to error: {e}")
 
-    # Await all scraper tasks with error handling
+    # SerperNewsScraper：同步 HTTP 调用放到线程任务里，与其它抓取源并行执行，
+    # 不再在 gather 之前串行阻塞事件循环
+    scraper_tasks.append(
+        _scrape_then_process(_collect_serper_articles(), nlp_tasks, seen_links, title_deduper)
+    )
+    logger.info("SerperNewsScraper task created")
+
+    # Await scraper tasks as they complete, so NLP on the first returning
+    # source overlaps with the still-running scrapers instead of waiting
+    # for the slowest one at a gather barrier.
     logger.info(f"Awaiting {len(scraper_tasks)} scraper tasks concurrently...")
-    results = await asyncio.gather(*scraper_tasks, return_exceptions=True)
-    logger.info(f"All scraper tasks completed. Processing {len(results)} results...")
-    
-    for i, result in enumerate(results):
-        if isinstance(result, Exception):
-            logger.error(f"Scraper task {i+1} failed with exception: {result}", exc_info=True)
-            logger.warning(f"Continuing with other scrapers despite error in task {i+1}")
-        elif isinstance(result, List):
-            # Each result_list is expected to contain Article objects
+    for i, completed in enumerate(asyncio.as_completed(scraper_tasks)):
+        try:
+            result = await completed
+        except Exception as e:
+            logger.error(f"Scraper task failed with exception: {e}", exc_info=True)
+            logger.warning("Continuing with other scrapers despite the error")
+            continue
+
+        if isinstance(result, List):
+            # Each result list is expected to contain Article objects
             if result:
                 # Verify result contains Article objects
-                sample = result[0] if result else None
-                if sample and isinstance(sample, Article):
-                    logger.info(f"Scraper task {i+1} collected {len(result)} Article objects")
-                    logger.debug(f"  Sample article from task {i+1}: type={type(sample)}, title='{sample.title[:50]}...'")
+                sample = result[0]
+                if isinstance(sample, Article):
+                    logger.info(f"Scraper result {i+1} collected {len(result)} Article objects")
+                    logger.debug("  Sample article from result %d: type=%s, title='%s...'", i + 1, type(sample), sample.title[:50])
                 else:
-                    logger.warning(f"Scraper task {i+1} returned non-Article objects: {type(sample)}")
+                    logger.warning(f"Scraper result {i+1} returned non-Article objects: {type(sample)}")
+                # NLP 任务已在 _scrape_then_process / _stream_rss_articles 中启动
                 all_articles_collected.extend(result)
             else:
-                logger.info(f"Scraper task {i+1} returned empty list")
+                logger.info(f"Scraper result {i+1} returned empty list")
         else:
-            logger.warning(f"Unexpected result type from scraper task {i+1}: {type(result)}")
+            logger.warning(f"Unexpected result type from scraper task: {type(result)}")
 
     logger.info("All scrapers finished.")
 
@@ -234,25 +297,20 @@ async def main():
             if i >= 3: # Print first 3 raw articles
                 break
             # Access properties directly, not with .get()
-            logger.info(f"  Sample collected article {i+1}: Title='{article.title[:80]}...', Link='{str(article.link)[:80]}...'")
+            logger.info("  Sample collected article %d: Title='%s...', Link='%s...'", i + 1, article.title[:80], article.link_str[:80])
     logger.info(f"------------------------------------------------")
 
     # Process articles (NLP, deduplication logic will be here later)
     logger.info(f"--- NLP Processing Stage ---")
     initial_article_count_before_nlp = len(all_articles_collected)
     logger.info(f"Articles before NLP processing: {initial_article_count_before_nlp}")
-    
-    # Verify all collected articles are Article objects
-    if all_articles_collected:
-        sample_collected = all_articles_collected[0]
-        logger.info(f"Sample collected article type: {type(sample_collected)}")
-        if isinstance(sample_collected, Article):
-            logger.info(f"Sample collected article: title='{sample_collected.title[:50]}...', link='{str(sample_collected.link)[:50]}...'")
-        else:
-            logger.error(f"CRITICAL: Collected article is not an Article object! Type: {type(sample_collected)}")
-    
-    # Pass Article objects directly to NLP processor
-    processed_articles = await _process_articles_with_nlp(all_articles_collected)
+
+    # NLP tasks were launched per scraper result as soon as each source
+    # finished; wait for the remaining ones here.
+    processed_articles: List[Article] = []
+    if nlp_tasks:
+        for batch_result in await asyncio.gather(*nlp_tasks):
+            processed_articles.extend(batch_result)
     logger.info(f"Articles after NLP processing: {len(processed_articles)}")
     logger.info(f"NLP processing: {initial_article_count_before_nlp} -> {len(processed_articles)} articles")
 
@@ -260,7 +318,9 @@ async def main():
     # 去重逻辑 - 基于标题相似度
     # =====================================================
     logger.info(f"--- Deduplication Stage ---")
-    deduplicated_articles = _deduplicate_articles(processed_articles)
+    # URL 与标题相似度去重都已融合进 NLP 前的分批流程
+    # （_filter_new_articles / _stream_rss_articles），此处无需再扫一遍
+    deduplicated_articles = processed_articles
     logger.info(f"Articles after deduplication: {len(deduplicated_articles)}")
     
     # =====================================================
@@ -268,37 +328,31 @@ async def main():
     # =====================================================
     logger.info(f"--- Heat Score Filtering Stage ---")
     MIN_HEAT_SCORE = 30  # 热度阈值，低于此值的文章被过滤
-    filtered_articles = [a for a in deduplicated_articles if (a.heat_score or 0) >= MIN_HEAT_SCORE]
-    logger.info(f"Articles with heat_score >= {MIN_HEAT_SCORE}: {len(filtered_articles)}")
+    # 热度只取一次，后续阈值过滤 / top-N 都复用 (score, article) 对
+    scored_articles = [((a.heat_score or 0), a) for a in deduplicated_articles]
+    filtered_scored = [sa for sa in scored_articles if sa[0] >= MIN_HEAT_SCORE]
+    logger.info(f"Articles with heat_score >= {MIN_HEAT_SCORE}: {len(filtered_scored)}")
 
     # 如果过滤后太少，降低阈值再试
-    if len(filtered_articles) < 10:
+    if len(filtered_scored) < 10:
         MIN_HEAT_SCORE = 20
-        filtered_articles = [a for a in deduplicated_articles if (a.heat_score or 0) >= MIN_HEAT_SCORE]
-        logger.info(f"Lowered threshold to {MIN_HEAT_SCORE}: {len(filtered_articles)} articles")
-    
+        filtered_scored = [sa for sa in scored_articles if sa[0] >= MIN_HEAT_SCORE]
+        logger.info(f"Lowered threshold to {MIN_HEAT_SCORE}: {len(filtered_scored)} articles")
+
     # 最终限制数量，确保阅读体验
     MAX_FINAL_ARTICLES = 30  # 最多显示30篇
-    if len(filtered_articles) > MAX_FINAL_ARTICLES:
-        # 按热度排序，取 top N
-        filtered_articles = sorted(filtered_articles, key=lambda a: a.heat_score or 0, reverse=True)[:MAX_FINAL_ARTICLES]
+    if len(filtered_scored) > MAX_FINAL_ARTICLES:
+        # 堆取 top N，避免对全量结果完整排序
+        filtered_scored = heapq.nlargest(MAX_FINAL_ARTICLES, filtered_scored, key=lambda sa: sa[0])
         logger.info(f"Limited to top {MAX_FINAL_ARTICLES} by heat_score")
+    filtered_articles = [a for _, a in filtered_scored]
     
     logger.info(f"Final articles for email: {len(filtered_articles)}")
 
-    if processed_articles:
-        sample_article_nlp = processed_articles[0]
-        logger.info(f"Verifying first NLP processed article:")
-        logger.info(f"  Type: {type(sample_article_nlp)}")
-        logger.info(f"  Title: '{sample_article_nlp.title[:80]}...'")
-        logger.info(f"  Link: '{str(sample_article_nlp.link)[:80]}...'")
-        logger.info(f"  Published: '{sample_article_nlp.published}'")
-        logger.info(f"  Summary length: {len(sample_article_nlp.summary or '')} characters")
-        logger.info(f"  Tags: {sample_article_nlp.main_tags}")
-        logger.info(f"  Entities: {sample_article_nlp.entities}")
-    else:
+    # Sample verification already happens once inside _process_articles_with_nlp;
+    # repeating the same dump here only re-rendered the first article's fields.
+    if not processed_articles:
         logger.warning("No articles survived NLP processing or initial conversion. This is a critical point.")
-    logger.info(f"---------------------------------------------")
 
     # --- Calling upsert before checks ---
     logger.info(f"--- Supabase Upsert Pre-check Debug ---")
@@ -311,14 +365,14 @@ async def main():
         for i, article in enumerate(processed_articles):
             if i >= 3: # Print first 3 processed articles for upsert
                 break
-            logger.info(f"  Sample article {i+1} for upsert: Title='{article.title[:80]}...', Link='{str(article.link)[:80]}...'")
-            logger.info(f"    Published: {article.published}, Source: {article.source}")
+            logger.info("  Sample article %d for upsert: Title='%s...', Link='%s...'", i + 1, article.title[:80], article.link_str[:80])
+            logger.info("    Published: %s, Source: %s", article.published, article.source)
             # Validate key fields for Supabase
             if not article.title or not article.link or not article.published:
                  logger.error(f"    CRITICAL: Article {i+1} is missing title, link, or published date. This will likely cause Supabase upsert to fail or skip.")
             # HttpUrl automatically ensures it starts with http(s), but we can add an extra check if needed.
             # elif not str(article.link).startswith("http"):
-            #      logger.error(f"    CRITICAL: Article {i+1} link '{str(article.link)[:80]}...' does not look like a valid URL. Supabase 'url' field requires valid URL.")
+            #      logger.error(f"    CRITICAL: Article {i+1} link '{article.link_str[:80]}...' does not look like a valid URL. Supabase 'url' field requires valid URL.")
     logger.info(f"----------------------------------------")
 
     # --- Conditional Check for Supabase Upsert ---
@@ -329,28 +383,16 @@ async def main():
     logger.info(f"Supabase Manager initialized and configured: {is_supabase_ready}")
     logger.info(f"Processed articles available for upsert: {has_articles_to_upsert} (Count: {len(filtered_articles)})")
     
-    if is_supabase_ready and has_articles_to_upsert:
-        logger.info("Conditions met: Attempting to upsert articles to Supabase.")
-        
-        # Log sample article structure before upsert
-        if filtered_articles:
-            sample_for_upsert = filtered_articles[0]
-            logger.info(f"Sample article structure for upsert:")
-            logger.info(f"  Type: {type(sample_for_upsert)}")
-            logger.info(f"  Title: '{sample_for_upsert.title[:50]}...'")
-            logger.info(f"  Link: '{str(sample_for_upsert.link)[:50]}...'")
-            logger.info(f"  Published: {sample_for_upsert.published}")
-            logger.info(f"  Source: '{sample_for_upsert.source}'")
-            logger.info(f"  Has summary: {bool(sample_for_upsert.summary)}")
-            logger.info(f"  Tags count: {len(sample_for_upsert.tags)}")
-            logger.info(f"  Main tags: {sample_for_upsert.main_tags}")
-            logger.info(f"  Entities type: {type(sample_for_upsert.entities)}, keys: {list(sample_for_upsert.entities.keys()) if isinstance(sample_for_upsert.entities, dict) else 'N/A'}")
-        
+    # 输出阶段（Supabase 写入 / 静态页+邮件 / 收藏分析）互不依赖，
+    # 并发执行而不是串行排队等前一个网络/磁盘操作完成
+    output_tasks = []
+
+    async def _run_upsert() -> None:
         logger.info(f"Attempting to upsert {len(filtered_articles)} articles to Supabase table '{supabase_manager.table_name}'...")
         try:
-            # SupabaseManager.upsert_articles is synchronous, wrap with asyncio.to_thread
-            inserted_count, skipped_count = await asyncio.to_thread(
-                supabase_manager.upsert_articles, filtered_articles
+            # 异步路径：各分块并发发送（内部有信号量限流），转换部分在线程里跑
+            inserted_count, skipped_count = await supabase_manager.upsert_articles_async(
+                filtered_articles
             )
             logger.info(f"Supabase upsert result: Inserted/Updated: {inserted_count}, Skipped: {skipped_count}")
             if inserted_count == 0 and skipped_count == len(filtered_articles) and len(filtered_articles) > 0:
@@ -366,6 +408,10 @@ async def main():
             logger.error("  - Incorrect Supabase table name or column definitions.")
             logger.error("  - RLS (Row Level Security) policies preventing writes (check Supabase dashboard).")
             logger.error("  - Data format mismatch (e.g., non-string for text fields, invalid URLs for 'link' field).")
+
+    if is_supabase_ready and has_articles_to_upsert:
+        logger.info("Conditions met: Attempting to upsert articles to Supabase.")
+        output_tasks.append(_run_upsert())
     else:
         logger.warning("Supabase upsert conditions not met. Skipping upsert operation.")
         if not is_supabase_ready:
@@ -377,92 +423,244 @@ async def main():
 
     # --- Static Page Generation and Email Sending ---
     logger.info("Generating static page and preparing email content.")
-    display_module = DisplayModule()
+    display_module = _get_display_module()
 
-    if filtered_articles:
+    async def _run_publish() -> None:
         email_html = display_module.generate_email_html(filtered_articles, settings.GITHUB_PAGES_BASE_URL)
-        display_module.generate_static_site(
+        # 静态页写盘是阻塞 I/O，放到线程里执行，避免卡住事件循环
+        await asyncio.to_thread(
+            display_module.generate_static_site,
             settings.OUTPUT_DIR,
             filtered_articles,
             settings.GITHUB_PAGES_BASE_URL,
             settings.SUPABASE_URL,
-            settings.SUPABASE_ANON_KEY
+            settings.SUPABASE_ANON_KEY,
         )
 
         if settings.SENDER_EMAIL and settings.RECIPIENT_EMAIL:
-            send_daily_email("每日AI趋势简报", email_html)
+            # 邮件发送走同步 SMTP，同样放线程避免阻塞其他输出任务
+            await asyncio.to_thread(send_daily_email, "每日AI趋势简报", email_html)
         else:
             logger.warning("SENDER_EMAIL or RECIPIENT_EMAIL missing, skipping email send.")
+
+    if filtered_articles:
+        output_tasks.append(_run_publish())
     else:
         logger.warning("No processed articles available. Skipping email and static site generation.")
 
     # --- Favorite analysis ---
-    if supabase_manager is not None:
+    async def _run_favorite_analysis() -> None:
         try:
             favorite_articles = await asyncio.to_thread(supabase_manager.fetch_favorites_needing_analysis)
             if favorite_articles:
                 logger.info(f"Found {len(favorite_articles)} favorite articles needing analysis")
-                for fav in favorite_articles:
-                    analysis = await generate_favorite_analysis(fav)
-                    if analysis:
-                        await asyncio.to_thread(supabase_manager.update_favorite_analysis, fav.id, analysis)
+                # 有界并发处理收藏分析：多篇收藏的 LLM 调用与回写并行，
+                # 信号量防止一次性打满 LLM/Supabase 配额
+                favorite_semaphore = asyncio.Semaphore(5)
+
+                async def _analyze_favorite(fav: Article) -> None:
+                    async with favorite_semaphore:
+                        analysis = await generate_favorite_analysis(fav)
+                        if analysis:
+                            await asyncio.to_thread(
+                                supabase_manager.update_favorite_analysis, fav.id, analysis
+                            )
+
+                await asyncio.gather(*(_analyze_favorite(fav) for fav in favorite_articles))
             else:
                 logger.info("No favorite articles pending analysis")
         except Exception as e:
             logger.warning(f"Favorite analysis failed: {e}")
 
-    end_time = datetime.now()
-    duration = end_time - start_time
-    logger.info(f"Main scraper pipeline finished. Total duration: {duration}")
+    if supabase_manager is not None:
+        output_tasks.append(_run_favorite_analysis())
 
+    if output_tasks:
+        await asyncio.gather(*output_tasks)
 
-async def collect_from_async_iterator(async_iterator: AsyncIterator[Article]) -> List[Article]:
-    """Helper to collect all items from an async iterator into a list."""
-    items = []
-    async for item in async_iterator:
-        items.append(item)
-    return items
+    duration = time.perf_counter() - start_time
+    logger.info(f"Main scraper pipeline finished. Total duration: {duration:.3f}s")
 
 
-def _deduplicate_articles(articles: List[Article]) -> List[Article]:
+async def _collect_serper_articles() -> List[Article]:
+    """执行异步的 Serper 搜索，并把结果转换为 Article 列表。"""
+    try:
+        serper_scraper = SerperNewsScraper()
+        try:
+            serper_results = await serper_scraper.search(SERPER_NEWS_QUERY, num=20)
+        finally:
+            await serper_scraper.aclose()
+    except Exception as e:
+        logger.warning(f"SerperNewsScraper skipped due to error: {e}")
+        return []
+
+    serper_articles: List[Article] = []
+    fallback_published = datetime.now(timezone.utc)  # 取一次，所有缺日期的条目复用
+    for item in serper_results:
+        raw = {
+            "title": item.get("title"),
+            "link": item.get("link"),
+            "published": item.get("date") or fallback_published,
+            "source": item.get("source") or "Serper News",
+            "summary": item.get("snippet")
+        }
+        try:
+            serper_articles.append(Article.from_raw_article(raw))
+        except Exception as e:
+            logger.warning(f"Serper item conversion failed: {e}")
+    logger.info(f"SerperNewsScraper collected {len(serper_articles)} items")
+    return serper_articles
+
+
+def _filter_new_articles(
+    articles: List[Article], seen_links: set, title_deduper: _TitleDeduper
+) -> List[Article]:
+    """
+    跨抓取源去重：同一链接或相似标题只进一次 NLP，省掉重复的 LLM 调用。
+    """
+    fresh = []
+    for article in articles:
+        link_str = article.link_str
+        if link_str in seen_links:
+            continue
+        seen_links.add(link_str)
+        if title_deduper.seen(article.title):
+            continue
+        fresh.append(article)
+    if len(fresh) < len(articles):
+        logger.info("Dedup dropped %d duplicate articles before NLP", len(articles) - len(fresh))
+    return fresh
+
+
+async def _scrape_then_process(
+    scrape_coro, nlp_tasks: List[asyncio.Task], seen_links: set, title_deduper: _TitleDeduper
+) -> List[Article]:
+    """等待一个抓取任务完成后，立即为其结果启动 NLP 处理任务。"""
+    result = await scrape_coro
+    result = _filter_new_articles(result or [], seen_links, title_deduper)
+    if result:
+        nlp_tasks.append(asyncio.create_task(_process_articles_with_nlp(result)))
+    return result
+
+
+async def _stream_rss_articles(
+    rss_scraper: RSSScraper,
+    days_ago: int,
+    nlp_tasks: List[asyncio.Task],
+    seen_links: set,
+    title_deduper: _TitleDeduper,
+    batch_size: int,
+) -> List[Article]:
     """
-    基于标题相似度去重。
-    使用简单的词重叠算法，避免重复内容出现在邮件中。
+    流式消费 RSS 抓取结果：生产者把文章写入有界队列，消费者攒满一个
+    NLP 批次就立即启动处理任务，而不是等所有 feed 抓完再一次性送入 NLP。
+    返回收集到的全部原始文章（供统计与后续阶段使用）。
     """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=batch_size * 4)
+
+    async def _producer():
+        try:
+            async for article in rss_scraper.scrape_articles(days_ago=days_ago, fetch_full_content=True):
+                await queue.put(article)
+        finally:
+            # 结束哨兵必须放在 finally：生产者异常/被取消时若不放，
+            # 消费者会永远阻塞在 queue.get() 上，整条流水线挂死
+            await queue.put(None)
+
+    producer_task = asyncio.create_task(_producer())
+
+    collected: List[Article] = []
+    batch: List[Article] = []
+    while True:
+        item = await queue.get()
+        if item is None:
+            break
+        # 跨源去重（URL + 标题相似度）：重复文章不再进入 NLP 批次
+        link_str = item.link_str
+        if link_str in seen_links:
+            continue
+        seen_links.add(link_str)
+        if title_deduper.seen(item.title):
+            continue
+        collected.append(item)
+        batch.append(item)
+        if len(batch) >= batch_size:
+            nlp_tasks.append(asyncio.create_task(_process_articles_with_nlp(batch)))
+            batch = []
+    if batch:
+        nlp_tasks.append(asyncio.create_task(_process_articles_with_nlp(batch)))
+
+    await producer_task
+    return collected
+
+
+# 标题去重用的常见词表（模块级常量，避免每篇文章重建集合）
+_STOP_WORDS = frozenset({
+    'the', 'a', 'an', 'of', 'and', 'or', 'in', 'on', 'at', 'to', 'for', 'with',
+    'by', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has',
+    'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may',
+    'might', 'can', 'this', 'that', 'these', 'those', 'it', 'its',
+})
+
+# 标题分词用的预编译正则：比 split() 更稳（剥掉标点），
+# 且单次 findall 避免 split 后再逐词清洗的额外分配
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+
+class _TitleDeduper:
+    """
+    增量式标题相似度去重器。
+
+    用 关键词 -> 已登记标题下标 的倒排索引做 LSH 式分桶：只有与当前标题
+    共享关键词的标题才参与重叠计数，把 O(N^2) 全两两比较降为近似线性。
+    判定条件（共享词 >= 3 且标题长度相近）与原实现一致。
+    增量接口使去重可以融合进抓取/NLP 分批流程，而不是事后再扫一遍。
+    """
+
+    def __init__(self) -> None:
+        self._kept_titles: List[str] = []           # 已登记标题（小写）
+        self._word_index: Dict[str, List[int]] = {} # 关键词 -> _kept_titles 下标
+
+    def seen(self, title: str) -> bool:
+        """判断标题是否与已登记标题重复；不重复则登记并返回 False。"""
+        title_lower = title.lower()
+        words = set(_TOKEN_RE.findall(title_lower)) - _STOP_WORDS
+
+        if words:
+            # 通过倒排索引统计共享词数，只精确比较共享 >= 3 个词的候选
+            overlap_counts: Counter = Counter()
+            for word in words:
+                for idx in self._word_index.get(word, ()):
+                    overlap_counts[idx] += 1
+            for idx, overlap in overlap_counts.items():
+                # 如果重叠词 >= 3，且标题长度相近，认为是重复
+                if overlap >= 3 and abs(len(title_lower) - len(self._kept_titles[idx])) < 50:
+                    return True
+
+        new_idx = len(self._kept_titles)
+        self._kept_titles.append(title_lower)
+        for word in words:
+            self._word_index.setdefault(word, []).append(new_idx)
+        return False
+
+
+def _deduplicate_articles(articles: List[Article]) -> List[Article]:
+    """基于标题相似度去重（一次性接口，内部复用 _TitleDeduper）。"""
     if not articles:
         return []
-    
-    unique_articles = []
-    for article in articles:
-        title_lower = article.title.lower()
-        # 提取标题中的关键词（去掉常见词）
-        stop_words = {'the', 'a', 'an', 'of', 'and', 'or', 'in', 'on', 'at', 'to', 'for', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might', 'can', 'this', 'that', 'these', 'those', 'it', 'its'}
-        words = set(title_lower.split())
-        words = words - stop_words
-        
-        is_duplicate = False
-        for existing in unique_articles:
-            existing_title = existing.title.lower()
-            existing_words = set(existing_title.split()) - stop_words
-            
-            # 计算词重叠率
-            if words and existing_words:
-                overlap = len(words & existing_words)
-                # 如果重叠词 >= 3，且两个标题都较短，认为是重复
-                if overlap >= 3:
-                    # 额外检查：标题长度相近
-                    if abs(len(title_lower) - len(existing_title)) < 50:
-                        is_duplicate = True
-                        break
-        
-        if not is_duplicate:
-            unique_articles.append(article)
-    
-    return unique_articles
+    deduper = _TitleDeduper()
+    return [a for a in articles if not deduper.seen(a.title)]
 
 
 if __name__ == "__main__":
     logger.info("Initializing main scraper. Running in DEBUG mode." if settings.DEBUG else "Initializing main scraper.")
+    # uvloop 显著加速 asyncio 的网络 I/O；Windows（计划任务场景）或未安装时静默跳过
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        logger.info("Using uvloop event loop policy.")
+    except ImportError:
+        pass
     try:
         asyncio.run(main())
         logger.info("Main scraper execution completed.")
@@ -1,11 +1,20 @@
 # src/nlp_processor.py
+import contextlib
+import functools
+import hashlib
 import json
 import logging
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import asyncio
 
-from openai import OpenAI
+# orjson 解析 LLM 返回的 JSON 比标准库快；未安装时退回 stdlib json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from openai import AsyncOpenAI
 from src.data_models import Article
 
 logger = logging.getLogger(__name__)
@@ -13,17 +22,61 @@ logger = logging.getLogger(__name__)
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 OPENAI_MODEL = os.environ.get("OPENAI_MODEL")
 
+# 每次 LLM 请求合并处理的文章数：>1 时多篇文章共享一次请求的网络往返
+# 和系统提示词开销。默认 1 保持逐篇行为（输出质量最稳）。
+NLP_ARTICLES_PER_REQUEST = max(1, int(os.environ.get("NLP_ARTICLES_PER_REQUEST", "1")))
+
+# 全局 LLM 并发上限：批处理窗口只约束单次 batch 内部，流式管道会同时
+# 启动多个 batch 再叠加收藏分析，必须有一个共享信号量兜底 API 配额。
+# 默认 16；显式设 0 才是"不限制"
+NLP_MAX_CONCURRENCY = int(os.environ.get("NLP_MAX_CONCURRENCY", "16"))
+_llm_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _llm_slot():
+    """返回全局 LLM 并发闸门；未配置上限时返回空上下文。"""
+    global _llm_semaphore
+    if NLP_MAX_CONCURRENCY <= 0:
+        return contextlib.nullcontext()
+    if _llm_semaphore is None:
+        _llm_semaphore = asyncio.Semaphore(NLP_MAX_CONCURRENCY)
+    return _llm_semaphore
+
+# 模块级客户端缓存：客户端构建（含 TLS 连接池初始化）只做一次
+_client: Optional[AsyncOpenAI] = None
+
 
-def _build_client() -> OpenAI:
+def _get_client() -> AsyncOpenAI:
+    global _client
+    if _client is None:
+        _client = _build_client()
+    return _client
+
+
+def warmup() -> None:
+    """
+    预热 NLP 后端。
+
+    本项目的 NLP 走远程 LLM API（没有本地 spaCy/transformer 模型），
+    冷启动成本在于客户端构建与配置校验。在抓取开始前调用一次，
+    避免首批文章处理时才付这笔开销。
+    """
+    _get_client()
+    logger.info("NLP backend warmed up (LLM client ready, model: %s)", _select_model())
+
+
+def _build_client() -> AsyncOpenAI:
     if not OPENAI_API_KEY:
         raise ValueError("OPENAI_API_KEY is missing")
     # OpenRouter key starts with sk-or-
     if OPENAI_API_KEY.startswith("sk-or-"):
-        return OpenAI(api_key=OPENAI_API_KEY, base_url="https://openrouter.ai/api/v1")
-    return OpenAI(api_key=OPENAI_API_KEY)
+        return AsyncOpenAI(api_key=OPENAI_API_KEY, base_url="https://openrouter.ai/api/v1")
+    return AsyncOpenAI(api_key=OPENAI_API_KEY)
 
 
+@functools.lru_cache(maxsize=1)
 def _select_model() -> str:
+    # 每次 LLM 调用都会取一次模型名；环境变量在进程生命周期内不变，缓存判定结果
     if OPENAI_MODEL:
         return OPENAI_MODEL
     if OPENAI_API_KEY and OPENAI_API_KEY.startswith("sk-or-"):
@@ -31,12 +84,14 @@ def _select_model() -> str:
     return "gpt-4o-mini"
 
 
-async def call_llm(prompt: str) -> Dict[str, Any]:
-    client = _build_client()
+async def call_llm(prompt: str) -> str:
+    """调用 LLM 并返回回复正文（期望是 JSON 文本）。"""
+    # AsyncOpenAI 原生异步请求：不再为每次调用占用一个线程池线程
+    client = _get_client()
     model = _select_model()
 
-    def _call():
-        return client.chat.completions.create(
+    async with _llm_slot():
+        response = await client.chat.completions.create(
             model=model,
             messages=[
                 {
@@ -48,17 +103,17 @@ async def call_llm(prompt: str) -> Dict[str, Any]:
             temperature=0.2,
             response_format={"type": "json_object"},
         )
-
-    response = await asyncio.to_thread(_call)
-    return response.model_dump() if hasattr(response, "model_dump") else response
+    # 直接取属性而不是 model_dump()：整个响应转 dict 会把用不到的
+    # usage/logprobs 等字段也序列化一遍，这里只需要回复正文
+    return response.choices[0].message.content
 
 
 async def call_llm_text(prompt: str) -> str:
-    client = _build_client()
+    client = _get_client()
     model = _select_model()
 
-    def _call():
-        return client.chat.completions.create(
+    async with _llm_slot():
+        response = await client.chat.completions.create(
             model=model,
             messages=[
                 {
@@ -69,35 +124,12 @@ async def call_llm_text(prompt: str) -> str:
             ],
             temperature=0.2,
         )
+    return response.choices[0].message.content.strip()
 
-    response = await asyncio.to_thread(_call)
-    payload = response.model_dump() if hasattr(response, "model_dump") else response
-    return payload["choices"][0]["message"]["content"].strip()
-
-
-def _safe_json_parse(text: str) -> Dict[str, Any]:
-    try:
-        return json.loads(text)
-    except Exception:
-        start = text.find("{")
-        end = text.rfind("}")
-        if start != -1 and end != -1 and end > start:
-            try:
-                return json.loads(text[start : end + 1])
-            except Exception:
-                return {}
-        return {}
-
-
-async def process_article_with_nlp(article: Article) -> Article:
-    logger.info(f"Processing article '{article.title[:60]}...' with NLP...")
-
-    content_to_analyze = article.content or article.summary or article.title
-    content_preview = (
-        content_to_analyze[:3000] if len(content_to_analyze) > 3000 else content_to_analyze
-    )
 
-    prompt = f"""
+# 提示词模板提升为模块常量：避免每篇文章重建多行字符串，
+# 调用处只做一次 format 填充标题与正文
+_NLP_PROMPT_TEMPLATE = """
 请根据以下文章信息，输出中文结构化结果，字段如下：
 
 {{
@@ -110,43 +142,134 @@ async def process_article_with_nlp(article: Article) -> Article:
   "heat_score": 0-100
 }}
 
-文章标题: {article.title}
-文章摘要/内容: {content_preview}
+文章标题: {title}
+文章摘要/内容: {content}
+"""
+
+# 多篇合并请求的模板：要求模型按编号返回数组，缺编号的文章走逐篇回退
+_NLP_MULTI_PROMPT_TEMPLATE = """
+请对下面编号的每篇文章分别输出中文结构化结果，返回一个 JSON 对象：
+
+{{
+  "articles": [
+    {{
+      "index": 文章编号,
+      "summary_zh": "中文简报（80-150字）",
+      "plain_summary": "通俗总结（用简单的话解释专业术语，让非专业读者也能理解核心内容，100-200字）",
+      "key_points": ["要点1", "要点2", "要点3"],
+      "entities": ["实体1", "实体2"],
+      "main_tags": ["能力", "成本", "范式", "格局", "产品", "政策", "融资", "开源"],
+      "trend_tag": "趋势标签（能力/成本/范式/格局/产品/政策/融资/开源之一）",
+      "heat_score": 0-100
+    }}
+  ]
+}}
+
+{articles}
 """
 
+_FAVORITE_PROMPT_TEMPLATE = """
+请基于以下文章内容，给出精炼中文分析，要求：
+1) 150-250字
+2) 删掉废话，保留关键信息
+3) 点出对行业的影响或趋势判断
+
+文章标题: {title}
+文章内容: {content}
+"""
+
+
+_JSON_DECODER = json.JSONDecoder()
+
+
+def _safe_json_parse(text: str) -> Dict[str, Any]:
     try:
-        response = await call_llm(prompt)
-        response_content_str = response["choices"][0]["message"]["content"]
-        nlp_data = _safe_json_parse(response_content_str)
+        if orjson is not None:
+            return orjson.loads(text)
+        return json.loads(text)
+    except Exception:
+        # raw_decode 从第一个 "{" 开始解析并在对象结束处停下：
+        # 不需要 rfind 猜右边界，也不复制子串，对带尾部噪声的回复更稳
+        start = text.find("{")
+        if start == -1:
+            return {}
+        try:
+            obj, _ = _JSON_DECODER.raw_decode(text, start)
+        except Exception:
+            return {}
+        return obj if isinstance(obj, dict) else {}
 
-        article.summary_zh = nlp_data.get("summary_zh")
-        article.plain_summary = nlp_data.get("plain_summary")
-        article.key_points = (
-            nlp_data.get("key_points", [])
-            if isinstance(nlp_data.get("key_points"), list)
-            else []
-        )
 
-        entities_list = nlp_data.get("entities", [])
-        if isinstance(entities_list, list):
-            article.entities = {"MISC": entities_list} if entities_list else {}
-        elif isinstance(entities_list, dict):
-            article.entities = entities_list
-        else:
-            article.entities = {}
+# 进程内 NLP 结果缓存：同一 (标题, 正文) 的文章（多源转载、重复运行）
+# 直接复用上次解析出的结构化字段，省掉一次 LLM 请求
+_NLP_RESULT_CACHE: Dict[str, Dict[str, Any]] = {}
+
+
+def _article_cache_key(article: Article) -> str:
+    content = article.content or article.summary or ""
+    return hashlib.sha256(f"{article.title}\x00{content}".encode("utf-8")).hexdigest()
 
-        article.main_tags = (
-            nlp_data.get("main_tags", [])
-            if isinstance(nlp_data.get("main_tags"), list)
-            else []
-        )
-        article.trend_tag = nlp_data.get("trend_tag")
 
-        heat_score = nlp_data.get("heat_score")
-        if isinstance(heat_score, (int, float)):
-            article.heat_score = max(0, min(100, float(heat_score)))
-        else:
-            article.heat_score = None
+def _apply_nlp_data(article: Article, nlp_data: Dict[str, Any]) -> None:
+    """把 LLM 返回的结构化字段写回 Article（逐篇与合并请求两条路径共用）。"""
+    article.summary_zh = nlp_data.get("summary_zh")
+    article.plain_summary = nlp_data.get("plain_summary")
+    article.key_points = (
+        nlp_data.get("key_points", [])
+        if isinstance(nlp_data.get("key_points"), list)
+        else []
+    )
+
+    entities_list = nlp_data.get("entities", [])
+    if isinstance(entities_list, list):
+        article.entities = {"MISC": entities_list} if entities_list else {}
+    elif isinstance(entities_list, dict):
+        article.entities = entities_list
+    else:
+        article.entities = {}
+
+    article.main_tags = (
+        nlp_data.get("main_tags", [])
+        if isinstance(nlp_data.get("main_tags"), list)
+        else []
+    )
+    article.trend_tag = nlp_data.get("trend_tag")
+
+    heat_score = nlp_data.get("heat_score")
+    if isinstance(heat_score, (int, float)):
+        article.heat_score = max(0, min(100, float(heat_score)))
+    else:
+        article.heat_score = None
+
+
+async def process_article_with_nlp(article: Article) -> Article:
+    # 已带完整 NLP 字段的文章（如从 Supabase 回读的存量数据）直接返回，
+    # 不再为同样的内容重复付一次 LLM 请求
+    if article.summary_zh and article.heat_score is not None:
+        logger.debug("Article '%s...' already enriched, skipping NLP", article.title[:60])
+        return article
+
+    cache_key = _article_cache_key(article)
+    cached = _NLP_RESULT_CACHE.get(cache_key)
+    if cached is not None:
+        logger.info(f"NLP cache hit for article '{article.title[:60]}...'")
+        _apply_nlp_data(article, cached)
+        return article
+
+    logger.info(f"Processing article '{article.title[:60]}...' with NLP...")
+
+    content_to_analyze = article.content or article.summary or article.title
+    # 切片本身对短字符串是空操作，无需先比较长度
+    content_preview = content_to_analyze[:3000]
+
+    prompt = _NLP_PROMPT_TEMPLATE.format(title=article.title, content=content_preview)
+
+    try:
+        response_content_str = await call_llm(prompt)
+        nlp_data = _safe_json_parse(response_content_str)
+        _apply_nlp_data(article, nlp_data)
+        if nlp_data:
+            _NLP_RESULT_CACHE[cache_key] = nlp_data
 
     except Exception as e:
         logger.error(
@@ -161,21 +284,56 @@ async def process_article_with_nlp(article: Article) -> Article:
     return article
 
 
+async def _process_article_group(articles: List[Article]) -> List[Article]:
+    """
+    把一组文章合并进一次 LLM 请求处理。
+
+    响应按编号映射回各篇文章；缺编号或整次请求失败时回退为逐篇调用，
+    保证合并模式最坏情况下不丢文章。
+    """
+    if len(articles) == 1:
+        return [await process_article_with_nlp(articles[0])]
+
+    blocks = []
+    for idx, article in enumerate(articles):
+        content_preview = (article.content or article.summary or article.title)[:3000]
+        blocks.append(f"【文章 {idx}】\n标题: {article.title}\n摘要/内容: {content_preview}")
+    prompt = _NLP_MULTI_PROMPT_TEMPLATE.format(articles="\n\n".join(blocks))
+
+    try:
+        response_content_str = await call_llm(prompt)
+        payload = _safe_json_parse(response_content_str)
+        entries = payload.get("articles")
+        by_index: Dict[int, Dict[str, Any]] = {}
+        if isinstance(entries, list):
+            for entry in entries:
+                if isinstance(entry, dict) and isinstance(entry.get("index"), int):
+                    by_index[entry["index"]] = entry
+
+        missing = []
+        for idx, article in enumerate(articles):
+            if idx in by_index:
+                _apply_nlp_data(article, by_index[idx])
+            else:
+                missing.append(article)
+        if missing:
+            logger.warning(
+                "Combined NLP response missing %d of %d articles, retrying them individually",
+                len(missing), len(articles),
+            )
+            await asyncio.gather(*(process_article_with_nlp(a) for a in missing))
+    except Exception as e:
+        logger.error(f"Combined NLP request failed ({e}); falling back to per-article calls")
+        await asyncio.gather(*(process_article_with_nlp(a) for a in articles))
+
+    return articles
+
+
 async def generate_favorite_analysis(article: Article) -> str:
     content_to_analyze = article.content or article.summary or article.title
-    content_preview = (
-        content_to_analyze[:3500] if len(content_to_analyze) > 3500 else content_to_analyze
-    )
+    content_preview = content_to_analyze[:3500]
 
-    prompt = f"""
-请基于以下文章内容，给出精炼中文分析，要求：
-1) 150-250字
-2) 删掉废话，保留关键信息
-3) 点出对行业的影响或趋势判断
-
-文章标题: {article.title}
-文章内容: {content_preview}
-"""
+    prompt = _FAVORITE_PROMPT_TEMPLATE.format(title=article.title, content=content_preview)
 
     try:
         return await call_llm_text(prompt)
@@ -187,24 +345,55 @@ async def generate_favorite_analysis(article: Article) -> str:
 async def process_articles_batch(
     articles: List[Article], batch_size: int = 10
 ) -> List[Article]:
-    logger.info(f"Processing {len(articles)} articles in batches of {batch_size}...")
+    logger.info(
+        f"Processing {len(articles)} articles with a concurrency window of {batch_size}..."
+    )
+
+    # 按正文长度排序：滑动窗口下同时在途的请求成本相近，减少长短混排带来的抖动
+    articles = sorted(
+        articles, key=lambda a: len(a.content or a.summary or a.title)
+    )
+
+    # 信号量滑动窗口代替分批 gather：一条请求完成立刻放行下一条，
+    # 不再让整批等待最慢的那条请求（批间空档全部消除）
+    semaphore = asyncio.Semaphore(batch_size)
 
-    processed_articles = []
+    async def _process_gated(article: Article) -> Article:
+        async with semaphore:
+            return await process_article_with_nlp(article)
 
-    for i in range(0, len(articles), batch_size):
-        batch = articles[i : i + batch_size]
-        logger.info(f"Processing batch {i // batch_size + 1} ({len(batch)} articles)...")
+    if NLP_ARTICLES_PER_REQUEST > 1:
+        # 合并模式：长度排序后相邻文章成本相近，按组共享一次 LLM 请求
+        groups = [
+            articles[i : i + NLP_ARTICLES_PER_REQUEST]
+            for i in range(0, len(articles), NLP_ARTICLES_PER_REQUEST)
+        ]
 
-        batch_results = await asyncio.gather(
-            *[process_article_with_nlp(article) for article in batch],
+        async def _process_group_gated(group: List[Article]) -> List[Article]:
+            async with semaphore:
+                return await _process_article_group(group)
+
+        results = await asyncio.gather(
+            *[_process_group_gated(group) for group in groups],
             return_exceptions=True,
         )
-
-        for result in batch_results:
-            if isinstance(result, Exception):
-                logger.error(f"Error in batch processing: {result}")
-            else:
-                processed_articles.append(result)
+        # 过滤/展开用推导式一次完成，异常单独挑出来记日志
+        for exc in (r for r in results if isinstance(r, Exception)):
+            logger.error(f"Error in batch processing: {exc}")
+        processed_articles = [
+            article
+            for group in results
+            if not isinstance(group, Exception)
+            for article in group
+        ]
+    else:
+        results = await asyncio.gather(
+            *[_process_gated(article) for article in articles],
+            return_exceptions=True,
+        )
+        for exc in (r for r in results if isinstance(r, Exception)):
+            logger.error(f"Error in batch processing: {exc}")
+        processed_articles = [r for r in results if not isinstance(r, Exception)]
 
     logger.info(f"Finished processing {len(processed_articles)} articles.")
     return processed_articles
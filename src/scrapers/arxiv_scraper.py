@@ -2,6 +2,7 @@ import asyncio
 import arxiv
 import logging
 import re
+import threading
 import traceback
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta, timezone
@@ -9,10 +10,20 @@ from datetime import datetime, timedelta, timezone
 # 导入数据模型
 from src.data_models import Article
 
-# 配置日志（临时开启 DEBUG 用于调试）
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# 日志级别/格式由入口（main_scraper 的 dictConfig）统一配置
 logger = logging.getLogger(__name__)
 
+# 从 entry_id 提取短 ID 用的正则，模块级预编译（每篇论文都要匹配一次）
+_ARXIV_ID_RE = re.compile(r'/(\d+\.\d+)')
+
+
+def _to_utc(dt: datetime) -> datetime:
+    """把 naive/带其他时区的时间统一规范为 UTC 时区感知时间。"""
+    if dt.tzinfo is None or dt.tzinfo.utcoffset(dt) is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
 class ArxivScraper:
     def __init__(self, query_categories: List[str] = ['cs.AI', 'cs.LG', 'cs.CL'], max_results_per_category: int = 20):
         """
@@ -22,8 +33,34 @@ class ArxivScraper:
         """
         self.query_categories = query_categories
         self.max_results_per_category = max_results_per_category
+        # 各类别共用一个 client：复用底层 HTTP 会话/连接，
+        # 其内置的请求间隔也在所有类别间统一限速
+        self._client = arxiv.Client()
+        # arxiv.Client 的 requests.Session 和限速状态都不是线程安全的，
+        # 各类别线程并发消费结果时必须串行化对 API 的访问——
+        # 反正 client 内置 delay 也会把请求排成队，锁不会损失吞吐
+        self._client_lock = threading.Lock()
         logger.info(f"ArxivScraper initialized for categories: {', '.join(query_categories)}")
 
+    def _collect_recent(self, search: "arxiv.Search", start_date_utc: datetime) -> List[tuple]:
+        """
+        流式消费查询结果并提前终止。
+
+        结果按提交时间降序返回：一旦遇到早于过滤窗口的论文即停止迭代，
+        后续更旧的分页请求根本不会发出。返回 (paper, published_utc) 对，
+        规范化时间只算一次供构建阶段复用。
+        """
+        collected = []
+        with self._client_lock:
+            for p in self._client.results(search):
+                if not p.published:
+                    continue
+                published_utc = _to_utc(p.published)
+                if published_utc < start_date_utc:
+                    break
+                collected.append((p, published_utc))
+        return collected
+
     async def scrape_articles(self, days_ago: int = 1) -> List[Article]:
         """
         从 arXiv 抓取指定天数内发布的文章。
@@ -31,22 +68,22 @@ class ArxivScraper:
         :return: 抓取到的文章列表（Article 实例）。
         """
         all_arxiv_articles = []
-        
+
         # 计算查询的日期范围 (用于本地过滤)，并提前转换为 UTC
-        start_date = datetime.now(timezone.utc) - timedelta(days=days_ago)
-        # 确保 start_date 是时区感知的 UTC 时间
-        if start_date.tzinfo is None or start_date.tzinfo.utcoffset(start_date) is None:
-            start_date_utc = start_date.replace(tzinfo=timezone.utc)
-        else:
-            start_date_utc = start_date.astimezone(timezone.utc)
-        
+        now_utc = datetime.now(timezone.utc)
+        fallback_published_iso = now_utc.isoformat()  # 缺发布日期时的回退值，循环外取一次
+        # now_utc 本身就是 UTC 时区感知时间，差值无需再做规范化
+        start_date_utc = now_utc - timedelta(days=days_ago)
+
+
         logger.info(f"Filtering papers published after: {start_date_utc} (UTC)")
-        
-        for category in self.query_categories:
+
+        async def _scrape_category(category: str) -> List[Article]:
+            category_articles: List[Article] = []
             # 简化查询字符串，让 arxiv 库处理日期筛选
             query_string = f'cat:{category}'
             logger.info(f"Searching arXiv for category '{category}' with query: '{query_string}'")
-            
+
             try:
                 # arxiv 库的 search 方法是同步的，需要通过 asyncio.to_thread 包装
                 search_results = await asyncio.to_thread(
@@ -57,57 +94,21 @@ class ArxivScraper:
                     sort_order=arxiv.SortOrder.Descending
                 )
                 
-                # 获取所有结果
-                client = arxiv.Client()  # 在循环内部创建 client
-                all_papers_raw = await asyncio.to_thread(list, client.results(search_results))
-                
-                logger.info(f"Got {len(all_papers_raw)} papers from arXiv API for category '{category}'")
-                
-                logger.info(f"Category '{category}': Total papers fetched before filtering: {len(all_papers_raw)}")
+                # 流式消费结果并提前终止（复用共享 client），
+                # 不再把全部分页 materialize 成 list 后才过滤
                 logger.debug(f"Filter start_date (UTC): {start_date_utc}")
+                papers = await asyncio.to_thread(
+                    self._collect_recent, search_results, start_date_utc
+                )
+
+                logger.info(f"Category '{category}': {len(papers)} papers within the date window")
                 
-                filtered_papers = []
-                for p in all_papers_raw:
-                    if p.published:
-                        # 确保日期都是时区感知的 UTC 时间
-                        # 如果 p.published 是 naive datetime，将其转换为 UTC
-                        if p.published.tzinfo is None or p.published.tzinfo.utcoffset(p.published) is None:
-                            published_utc = p.published.replace(tzinfo=timezone.utc)
-                        else:
-                            published_utc = p.published.astimezone(timezone.utc)
-                        
-                        # 调试信息：打印每篇论文的日期和比较结果
-                        comparison_result = published_utc >= start_date_utc
-                        logger.debug(f"  Paper: '{p.title[:60] if p.title else 'Unknown'}...'")
-                        logger.debug(f"    Published (UTC): {published_utc}")
-                        logger.debug(f"    Comparison: {published_utc} >= {start_date_utc} -> {comparison_result}")
-
-                        if comparison_result:
-                            filtered_papers.append(p)
-                            logger.debug(f"    ✓ Included")
-                        else:
-                            logger.debug(f"    ✗ Excluded (too old)")
-                    else:
-                        logger.debug(f"  Paper '{p.title[:60] if p.title else 'Unknown'}...' has no published date - excluded")
-                
-                papers = filtered_papers
-                
-                logger.info(f"Category '{category}': {len(papers)} papers passed filtering (from {len(all_papers_raw)} total)")
-                
-                for paper in papers:
+                for paper, published_utc in papers:
                     try:
-                        # 确保日期是 UTC 并格式化为 ISO 格式
-                        published_utc = None
-                        if paper.published:
-                            if paper.published.tzinfo is None or paper.published.tzinfo.utcoffset(paper.published) is None:
-                                published_utc = paper.published.replace(tzinfo=timezone.utc)
-                            else:
-                                published_utc = paper.published.astimezone(timezone.utc)
-                        
                         # 从 entry_id 中提取短 ID（例如从 http://arxiv.org/abs/1234.5678v1 提取 1234.5678）
                         paper_id = None
                         if paper.entry_id:
-                            match = re.search(r'/(\d+\.\d+)', paper.entry_id)
+                            match = _ARXIV_ID_RE.search(paper.entry_id)
                             if match:
                                 paper_id = match.group(1)
                         
@@ -125,7 +126,7 @@ class ArxivScraper:
                         article_data = {
                             "title": paper.title or "",
                             "link": paper.entry_id,  # arXiv paper ID acts as a direct link to abstract page
-                            "published": published_utc.isoformat() if published_utc else datetime.now(timezone.utc).isoformat(),  # Use ISO format string
+                            "published": published_utc.isoformat() if published_utc else fallback_published_iso,  # Use ISO format string
                             "source": "arXiv API",  # Required field
                             "authors": [author.name for author in paper.authors] if paper.authors else [],
                             "summary": paper.summary or "",
@@ -138,21 +139,28 @@ class ArxivScraper:
                         # 将字典数据转换为 Article 实例
                         article_instance = Article.from_raw_article(article_data)
                         logger.info(f"Scraped article: {article_instance.title}")
-                        all_arxiv_articles.append(article_instance)
-                    
+                        category_articles.append(article_instance)
+
                     except Exception as e:
                         logger.error(f"Error processing paper '{paper.title if paper.title else 'Unknown'}': {e}")
                         continue
-            
+
             except Exception as e:
                 error_type = type(e).__name__
                 logger.error(f"Error scraping arXiv category '{category}' ({error_type}): {e}")
                 logger.debug(f"Traceback: {traceback.format_exc()}")
                 logger.info(f"Continuing with next category...")
-            
-            # 在不同类别查询之间添加延迟，避免触发速率限制
-            await asyncio.sleep(2)
-        
+
+            return category_articles
+
+        # 各类别并发抓取：arxiv.Client 自带请求间隔做限速，
+        # 不再用类别间 sleep(2) 串行排队
+        category_results = await asyncio.gather(
+            *(_scrape_category(category) for category in self.query_categories)
+        )
+        for category_articles in category_results:
+            all_arxiv_articles.extend(category_articles)
+
         logger.info(f"Finished scraping arXiv. Total articles found: {len(all_arxiv_articles)}")
         return all_arxiv_articles
 
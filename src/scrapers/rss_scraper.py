@@ -1,15 +1,131 @@
 # src/scrapers/rss_scraper.py
+import asyncio
 import feedparser
+import gc
+import json
 import logging
+import os
+import xml.etree.ElementTree as ET
+from email.utils import parsedate_to_datetime
 from datetime import datetime, timezone, timedelta
 from typing import List, Dict, Any, AsyncIterator, Optional
+from urllib.parse import urlsplit
 import httpx  # 新增
-from bs4 import BeautifulSoup  # 新增
+from bs4 import BeautifulSoup, SoupStrainer  # 新增
+
+# selectolax (Lexbor 引擎) 解析 HTML 比 bs4+html.parser 快一个数量级；
+# 未安装时退回 BeautifulSoup
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+# hishel 是 httpx 的 RFC 9111 缓存客户端：自动按 Cache-Control/ETag/
+# Last-Modified 复用响应，跨运行省掉未变化页面的下载；未安装时用普通客户端
+try:
+    import hishel
+except ImportError:
+    hishel = None
 
 from src.data_models import Article
 
 logger = logging.getLogger(__name__)
 
+# 正文抓取的并发上限（同时对应连接池大小）
+FULL_CONTENT_CONCURRENCY = 10
+
+# 条件请求验证器（ETag/Last-Modified）的落盘位置：cron/定时任务每次运行
+# 都是新进程新实例，不落盘的话 If-None-Match/If-Modified-Since 永远发不出去
+VALIDATOR_CACHE_PATH = os.environ.get("RSS_VALIDATOR_CACHE", ".rss_feed_validators.json")
+
+# 单个 feed 允许读入的最大字节数：流式下载到上限即截断，
+# 防止异常大的 feed 一次性占满内存
+MAX_FEED_BYTES = 5 * 1024 * 1024
+
+# 单篇文章页面允许读入的最大字节数（正文提取对超长页面没有意义，
+# 超限多半是撞上了大文件/二进制资源）
+MAX_ARTICLE_BYTES = 2 * 1024 * 1024
+
+# feed 自带正文（content:encoded / 长 summary）达到该长度时，
+# 视为已拿到全文，不再对详情页发起 HTTP 请求
+INLINE_CONTENT_MIN_CHARS = 1000
+
+# BS4 回退路径只关心这几类标签；SoupStrainer 让解析器直接跳过
+# script/style/导航等无关节点，不为它们建树
+_CONTENT_STRAINER = SoupStrainer(['article', 'main', 'div', 'p'])
+
+# 正文容器候选选择器，模块级常量：每篇文章都要跑这个级联，
+# 不在调用处重建元组（与域名级缓存配合，命中的选择器排到最前）
+_CONTENT_SELECTORS = ('.entry-content', '#content', '.post-content',
+                      '.article-content', '.post-body')
+
+
+_ATOM_NS = '{http://www.w3.org/2005/Atom}'
+_DC_NS = '{http://purl.org/dc/elements/1.1/}'
+
+
+def _parse_arxiv_feed(feed_bytes: bytes) -> Optional[List[Dict[str, Any]]]:
+    """
+    arXiv 专用的轻量 feed 解析器。
+
+    arXiv 的 RSS/Atom 输出高度规则，用 xml.etree 直接取字段即可，
+    绕过 feedparser 的全格式探测/清洗管线。返回与 feedparser 条目
+    同构（entry.get(...) 兼容）的 dict 列表；解析不出来返回 None，
+    调用方退回 feedparser 通用路径。
+    """
+    try:
+        root = ET.fromstring(feed_bytes)
+    except ET.ParseError:
+        return None
+
+    entries: List[Dict[str, Any]] = []
+
+    # Atom (export.arxiv.org/api 风格)
+    for el in root.iter(_ATOM_NS + 'entry'):
+        link = ''
+        for link_el in el.findall(_ATOM_NS + 'link'):
+            if link_el.get('rel', 'alternate') == 'alternate':
+                link = link_el.get('href', '')
+                break
+        published = el.findtext(_ATOM_NS + 'published') or el.findtext(_ATOM_NS + 'updated')
+        published_parsed = None
+        if published:
+            try:
+                published_parsed = datetime.fromisoformat(
+                    published.replace('Z', '+00:00')
+                ).utctimetuple()
+            except ValueError:
+                pass
+        entries.append({
+            'title': (el.findtext(_ATOM_NS + 'title') or '').strip(),
+            'link': link,
+            'summary': el.findtext(_ATOM_NS + 'summary') or '',
+            'published_parsed': published_parsed,
+            'authors': [{'name': n.text} for n in el.iter(_ATOM_NS + 'name') if n.text],
+            'tags': [{'term': c.get('term')} for c in el.findall(_ATOM_NS + 'category') if c.get('term')],
+        })
+
+    if not entries:
+        # RSS 2.0 (rss.arxiv.org 风格)
+        for el in root.iter('item'):
+            pub = el.findtext('pubDate')
+            published_parsed = None
+            if pub:
+                try:
+                    published_parsed = parsedate_to_datetime(pub).utctimetuple()
+                except (TypeError, ValueError):
+                    pass
+            entries.append({
+                'title': (el.findtext('title') or '').strip(),
+                'link': el.findtext('link') or '',
+                'summary': el.findtext('description') or '',
+                'published_parsed': published_parsed,
+                'authors': [{'name': c.text} for c in el.findall(_DC_NS + 'creator') if c.text],
+                'tags': [{'term': c.text} for c in el.findall('category') if c.text],
+            })
+
+    return entries or None
+
 
 class RSSScraper:
     def __init__(self, feed_configs: List[Dict[str, str]], max_entries_per_feed: int = 100,
@@ -26,25 +142,134 @@ class RSSScraper:
         self.max_entries_per_feed = max_entries_per_feed
         self.skip_full_content_for_arxiv = skip_full_content_for_arxiv
         self.last_fetched_times: Dict[str, datetime] = {}  # 记录每个 feed 最后抓取时间，用于去重和增量抓取
+        # 条件请求所需的验证器：源返回 304 时完全跳过下载与解析
+        self._feed_etags: Dict[str, str] = {}
+        self._feed_last_modified: Dict[str, str] = {}
+        self._load_validators()
+        # 各域名命中过的正文容器选择器：同一站点模板稳定，
+        # 记住上次成功的选择器，后续页面先试它而不是每次跑完整级联
+        self._domain_selectors: Dict[str, str] = {}
 
 
 
-    async def _fetch_full_content(self, url: str) -> Optional[str]:
+    def _load_validators(self) -> None:
+        """从磁盘恢复上次运行保存的 ETag/Last-Modified 验证器。"""
+        try:
+            with open(VALIDATOR_CACHE_PATH, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            self._feed_etags.update(cached.get('etags', {}))
+            self._feed_last_modified.update(cached.get('last_modified', {}))
+        except (OSError, ValueError):
+            pass  # 首次运行/缓存损坏都从零开始，不影响抓取
+
+    def _save_validators(self) -> None:
+        """把当前验证器写盘，供下次运行发条件请求。"""
+        if not (self._feed_etags or self._feed_last_modified):
+            return
+        try:
+            with open(VALIDATOR_CACHE_PATH, 'w', encoding='utf-8') as f:
+                json.dump(
+                    {'etags': self._feed_etags, 'last_modified': self._feed_last_modified},
+                    f,
+                    ensure_ascii=False,
+                )
+        except OSError as e:
+            logger.debug("Failed to persist feed validators: %s", e)
+
+    @staticmethod
+    def _html_to_text(html: str) -> str:
+        """把 feed 内嵌的 HTML 片段转成纯文本（无标签时原样返回）。"""
+        if '<' not in html:
+            return html
+        if LexborHTMLParser is not None:
+            body = LexborHTMLParser(html).body
+            if body is not None:
+                return body.text(separator='\n', strip=True)
+        return BeautifulSoup(html, 'html.parser').get_text(separator='\n', strip=True)
+
+    def _extract_content_lexbor(self, html: str, domain: Optional[str] = None) -> Optional[str]:
+        """用 selectolax/Lexbor 提取正文（与 BS4 回退路径相同的选择器级联）。"""
+        tree = LexborHTMLParser(html)
+
+        # 同域名优先复用上次命中的选择器
+        cached_selector = self._domain_selectors.get(domain) if domain else None
+        if cached_selector:
+            node = tree.css_first(cached_selector)
+            if node:
+                text = node.text(separator='\n', strip=True)
+                if text and len(text) > 100:
+                    return text
+
+        for selector in _CONTENT_SELECTORS:
+            if selector == cached_selector:
+                continue
+            node = tree.css_first(selector)
+            if node:
+                text = node.text(separator='\n', strip=True)
+                if text and len(text) > 100:  # 确保内容足够长
+                    if domain:
+                        self._domain_selectors[domain] = selector
+                    return text
+
+        # 找不到特定容器时退而求其次抓所有 p 标签
+        paragraphs = [p.text(strip=True) for p in tree.css('p')]
+        text = '\n'.join(p for p in paragraphs if p)
+        if text and len(text) > 100:
+            return text
+        return None
+
+    async def _download_page(self, client: httpx.AsyncClient, url: str) -> Optional[str]:
+        """
+        流式下载文章页面并限制读入字节数。
+
+        Content-Length 已超限的页面直接放弃；没有声明长度的边下边数，
+        到上限即截断（正文通常在页面前部，截断不影响提取）。
+        """
+        async with client.stream('GET', url, follow_redirects=True) as response:
+            response.raise_for_status()
+
+            content_length = response.headers.get('Content-Length')
+            if content_length and content_length.isdigit() and int(content_length) > MAX_ARTICLE_BYTES:
+                logger.debug(f"Skipping oversized page ({content_length} bytes): {url}")
+                return None
+
+            chunks = []
+            total_bytes = 0
+            async for chunk in response.aiter_bytes():
+                chunks.append(chunk)
+                total_bytes += len(chunk)
+                if total_bytes > MAX_ARTICLE_BYTES:
+                    logger.debug(f"Page exceeded {MAX_ARTICLE_BYTES} bytes, truncating: {url}")
+                    break
+
+        encoding = response.charset_encoding or 'utf-8'
+        return b''.join(chunks).decode(encoding, errors='replace')
+
+    async def _fetch_full_content(self, url: str, client: Optional[httpx.AsyncClient] = None) -> Optional[str]:
         """
         访问文章链接并尝试提取文章正文。
-        
+
         :param url: 文章链接
+        :param client: 可复用的 httpx 客户端；不传则临时创建一个
         :return: 提取到的正文内容，如果失败则返回 None
         """
         if not url or not url.startswith(('http://', 'https://')):
             return None
 
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(url, follow_redirects=True)
-                response.raise_for_status()  # 检查 HTTP 错误
+            if client is not None:
+                html = await self._download_page(client, url)
+            else:
+                async with httpx.AsyncClient(timeout=10.0) as ad_hoc_client:
+                    html = await self._download_page(ad_hoc_client, url)
+
+            if html is None:
+                return None
 
-            soup = BeautifulSoup(response.text, 'html.parser')
+            if LexborHTMLParser is not None:
+                return self._extract_content_lexbor(html, domain=urlsplit(url).netloc)
+
+            soup = BeautifulSoup(html, 'html.parser', parse_only=_CONTENT_STRAINER)
 
             # 尝试通过常见的标签和属性提取正文
             # 这只是一个简化的例子，实际的网页抓取需要更复杂的规则或库 (如 Goose3, newspaper3k)
@@ -84,108 +309,202 @@ class RSSScraper:
         :param fetch_full_content: 是否尝试抓取文章的完整内容。
         :return: 一个异步迭代器，每次返回一个 Article 实例。
         """
-        start_date = datetime.now(timezone.utc) - timedelta(days=days_ago)
-        start_date_utc = start_date.astimezone(timezone.utc)
+        now_utc = datetime.now(timezone.utc)
+        start_date_utc = now_utc - timedelta(days=days_ago)
         logger.info(f"Filtering RSS articles published after: {start_date_utc.isoformat()} (UTC)")
 
-        for config in self.feed_configs:
-            feed_name = config['name']
-            feed_url = config['url']
-            logger.info(f"Fetching RSS feed: {feed_name} from {feed_url}")
+        # 整个抓取周期（feed 下载 + 正文抓取）共享一个限定连接数的客户端：
+        # 连接复用省掉每个 feed/每篇文章的 TCP+TLS 握手；信号量限制正文并发
+        fetch_semaphore = asyncio.Semaphore(FULL_CONTENT_CONCURRENCY)
+        limits = httpx.Limits(
+            max_connections=FULL_CONTENT_CONCURRENCY,
+            max_keepalive_connections=FULL_CONTENT_CONCURRENCY,
+        )
+        if hishel is not None:
+            http_client = hishel.AsyncCacheClient(timeout=10.0, limits=limits)
+        else:
+            http_client = httpx.AsyncClient(timeout=10.0, limits=limits)
+
+        async def _fill_content(article: Article) -> None:
+            async with fetch_semaphore:
+                logger.debug(f"Fetching full content for article: {article.title[:60]}...")
+                full_content = await self._fetch_full_content(str(article.link), http_client)
+            if full_content:
+                # Use 'content' field instead of 'full_content' for new Article model
+                article.content = full_content
+                logger.debug(f"Successfully fetched full content ({len(full_content)} chars)")
+            else:
+                logger.debug(f"Failed to fetch full content for article: {article.title[:60]}...")
 
-            try:
-                async with httpx.AsyncClient(timeout=10.0) as client:
-                    response = await client.get(feed_url, follow_redirects=True)
-                    response.raise_for_status()
-                feed = feedparser.parse(response.text)
-
-                if feed.bozo:
-                    logger.warning(f"Error parsing feed {feed_name} ({feed_url}): {feed.bozo_exception}")
-                    continue
-
-                fetched_count = 0
-                filtered_count = 0
-
-                # arXiv RSS 通常详情页抓取慢，按配置跳过
-                effective_fetch_full_content = fetch_full_content
-                if self.skip_full_content_for_arxiv and 'arxiv.org' in feed_url:
-                    effective_fetch_full_content = False
-                    logger.info(f"Skipping full content fetch for arXiv feed: {feed_name}")
-
-                for entry in feed.entries:
-                    # 限制每个 RSS 源处理的最大条数
-                    if self.max_entries_per_feed and fetched_count >= self.max_entries_per_feed:
-                        logger.info(
-                            f"Reached max entries limit ({self.max_entries_per_feed}) for feed '{feed_name}'."
+        try:
+            for config in self.feed_configs:
+                feed_name = config['name']
+                feed_url = config['url']
+                logger.info(f"Fetching RSS feed: {feed_name} from {feed_url}")
+
+                try:
+                    # 带上次拿到的验证器做条件请求：没变化的 feed 直接 304 跳过
+                    conditional_headers = {}
+                    if feed_url in self._feed_etags:
+                        conditional_headers['If-None-Match'] = self._feed_etags[feed_url]
+                    if feed_url in self._feed_last_modified:
+                        conditional_headers['If-Modified-Since'] = self._feed_last_modified[feed_url]
+
+                    # 流式下载并限制读入字节数，而不是无上限的一次性 .content
+                    async with http_client.stream(
+                        'GET', feed_url, follow_redirects=True,
+                        headers=conditional_headers or None,
+                    ) as response:
+                        if response.status_code == 304:
+                            logger.info(f"Feed '{feed_name}' not modified since last fetch (304), skipping.")
+                            continue
+                        response.raise_for_status()
+
+                        chunks = []
+                        total_bytes = 0
+                        async for chunk in response.aiter_bytes():
+                            chunks.append(chunk)
+                            total_bytes += len(chunk)
+                            if total_bytes > MAX_FEED_BYTES:
+                                logger.warning(
+                                    f"Feed '{feed_name}' exceeded {MAX_FEED_BYTES} bytes, truncating download."
+                                )
+                                break
+                        feed_bytes = b''.join(chunks)
+
+                    if response.headers.get('ETag'):
+                        self._feed_etags[feed_url] = response.headers['ETag']
+                    if response.headers.get('Last-Modified'):
+                        self._feed_last_modified[feed_url] = response.headers['Last-Modified']
+                    self.last_fetched_times[feed_url] = now_utc
+
+                    # arXiv 的 XML 高度规则，先走专用 etree 解析器绕过
+                    # feedparser 的通用管线；失败再退回 feedparser
+                    feed = None
+                    entries = _parse_arxiv_feed(feed_bytes) if 'arxiv.org' in feed_url else None
+                    if entries is None:
+                        # 直接把原始字节交给 feedparser：跳过 httpx 的整段文本解码，
+                        # 编码探测交由 feedparser 按 XML 声明处理
+                        feed = feedparser.parse(feed_bytes)
+
+                        # bozo 只代表"解析中出现过问题"（编码告警、截断的尾部等），
+                        # 只要拿到了条目就继续用；整个 feed 一条都解不出来才放弃
+                        if feed.bozo and not feed.entries:
+                            logger.warning(f"Error parsing feed {feed_name} ({feed_url}): {feed.bozo_exception}")
+                            continue
+                        if feed.bozo:
+                            logger.debug(f"Feed {feed_name} parsed with warnings: {feed.bozo_exception}")
+                        entries = feed.entries
+
+                    fetched_count = 0
+                    filtered_count = 0
+
+                    # arXiv RSS 通常详情页抓取慢，按配置跳过
+                    effective_fetch_full_content = fetch_full_content
+                    if self.skip_full_content_for_arxiv and 'arxiv.org' in feed_url:
+                        effective_fetch_full_content = False
+                        logger.info(f"Skipping full content fetch for arXiv feed: {feed_name}")
+
+                    feed_articles: List[Article] = []
+                    for entry in entries:
+                        # 限制每个 RSS 源处理的最大条数
+                        if self.max_entries_per_feed and fetched_count >= self.max_entries_per_feed:
+                            logger.info(
+                                f"Reached max entries limit ({self.max_entries_per_feed}) for feed '{feed_name}'."
+                            )
+                            break
+
+                        fetched_count += 1
+                        published_parsed = entry.get('published_parsed')
+                        if published_parsed:
+                            # Convert entry's published date to UTC
+                            entry_published_dt = datetime(*published_parsed[:6], tzinfo=timezone.utc)
+                            entry_published_utc = entry_published_dt.astimezone(timezone.utc)
+                        else:
+                            entry_published_utc = now_utc  # Fallback if no published date（复用循环外时间戳）
+
+                        # 日期过滤
+                        if entry_published_utc >= start_date_utc:
+                            filtered_count += 1
+
+                            # 构建符合 Article.from_raw_article() 期望的数据结构
+                            title = entry.get('title', 'N/A')
+                            link = entry.get('link', 'N/A')
+                            summary = entry.get('summary', entry.get('description', ''))
+
+                            # 提取作者列表
+                            authors = []
+                            if entry.get('authors'):
+                                authors = [author.get('name', '') for author in entry.get('authors', []) if author.get('name')]
+
+                            # 提取标签/分类
+                            tags = []
+                            if entry.get('tags'):
+                                tags = [tag.get('term', '') for tag in entry.get('tags', []) if tag.get('term')]
+
+                            article_data = {
+                                "title": title,
+                                "link": link,
+                                "published": entry_published_utc.isoformat(),  # ISO format string
+                                "source": feed_name,  # Required field
+                                "authors": authors,
+                                "summary": summary,
+                                "tags": tags,
+                                "main_tags": [],  # Will be filled by NLP processing
+                                "entities": {},  # Dict[str, List[str]] format
+                                "language": "en",  # Default language
+                            }
+
+                            # feed 已内嵌完整正文（content:encoded 或足够长的 summary）时
+                            # 直接采用，后面不再为这篇文章发详情页请求。
+                            # 长度阈值按剥掉标签后的纯文本算：富标记摘要的原始
+                            # HTML 可以很长但正文寥寥，不该压掉详情页抓取
+                            inline_html = None
+                            entry_content = entry.get('content')
+                            if entry_content and isinstance(entry_content, list):
+                                inline_html = entry_content[0].get('value')
+                            for candidate in (inline_html, summary):
+                                if not candidate:
+                                    continue
+                                inline_text = self._html_to_text(candidate)
+                                if len(inline_text) >= INLINE_CONTENT_MIN_CHARS:
+                                    article_data["content"] = inline_text
+                                    break
+
+                            # 创建 Article 实例
+                            article = Article.from_raw_article(article_data)
+                            feed_articles.append(article)
+                        else:
+                            logger.debug(f"RSS article '{entry.get('title', 'N/A')}' from '{feed_name}' "
+                                         f"published: {entry_published_utc} (UTC) is too old. Excluded.")
+
+                    # 并发抓取该 feed 内所有文章的正文（信号量限流）
+                    if effective_fetch_full_content and feed_articles:
+                        await asyncio.gather(
+                            *(_fill_content(a) for a in feed_articles if a.link and not a.content)
                         )
-                        break
-
-                    fetched_count += 1
-                    published_parsed = entry.get('published_parsed')
-                    if published_parsed:
-                        # Convert entry's published date to UTC
-                        entry_published_dt = datetime(*published_parsed[:6], tzinfo=timezone.utc)
-                        entry_published_utc = entry_published_dt.astimezone(timezone.utc)
-                    else:
-                        entry_published_utc = datetime.now(timezone.utc)  # Fallback if no published date
-
-                    # 日期过滤
-                    if entry_published_utc >= start_date_utc:
-                        filtered_count += 1
-
-                        # 构建符合 Article.from_raw_article() 期望的数据结构
-                        title = entry.get('title', 'N/A')
-                        link = entry.get('link', 'N/A')
-                        summary = entry.get('summary', entry.get('description', ''))
-
-                        # 提取作者列表
-                        authors = []
-                        if entry.get('authors'):
-                            authors = [author.get('name', '') for author in entry.get('authors', []) if author.get('name')]
-
-                        # 提取标签/分类
-                        tags = []
-                        if entry.get('tags'):
-                            tags = [tag.get('term', '') for tag in entry.get('tags', []) if tag.get('term')]
-
-                        article_data = {
-                            "title": title,
-                            "link": link,
-                            "published": entry_published_utc.isoformat(),  # ISO format string
-                            "source": feed_name,  # Required field
-                            "authors": authors,
-                            "summary": summary,
-                            "tags": tags,
-                            "main_tags": [],  # Will be filled by NLP processing
-                            "entities": {},  # Dict[str, List[str]] format
-                            "language": "en",  # Default language
-                        }
-
-                        # 创建 Article 实例
-                        article = Article.from_raw_article(article_data)
-
-                        # 尝试抓取完整内容
-                        if effective_fetch_full_content and article.link:
-                            logger.debug(f"Fetching full content for article: {article.title[:60]}...")
-                            full_content = await self._fetch_full_content(str(article.link))
-                            if full_content:
-                                # Use 'content' field instead of 'full_content' for new Article model
-                                article.content = full_content
-                                logger.debug(f"Successfully fetched full content ({len(full_content)} chars)")
-                            else:
-                                logger.debug(f"Failed to fetch full content for article: {article.title[:60]}...")
 
+                    for article in feed_articles:
                         logger.info(f"Scraped RSS article from '{feed_name}': {article.title}")
                         yield article
-                    else:
-                        logger.debug(f"RSS article '{entry.get('title', 'N/A')}' from '{feed_name}' "
-                                     f"published: {entry_published_utc} (UTC) is too old. Excluded.")
 
-                logger.info(f"Finished fetching feed '{feed_name}'. Total entries: {fetched_count}, "
-                            f"passed date filter: {filtered_count}")
+                    logger.info(f"Finished fetching feed '{feed_name}'. Total entries: {fetched_count}, "
+                                f"passed date filter: {filtered_count}")
+
+                    # 显式释放已消费的 feed DOM：feedparser 的结果图引用密集，
+                    # 长时间跨多个 feed 运行会累积到下一轮 GC 才回收
+                    del feed, entries, feed_articles
+
+                except Exception as e:
+                    logger.error(f"An error occurred while scraping RSS feed '{feed_name}' ({feed_url}): {e}")
+
+            # 整轮 feed 抓完后统一做一次回收；逐 feed collect 的停顿不划算
+            gc.collect()
 
-            except Exception as e:
-                logger.error(f"An error occurred while scraping RSS feed '{feed_name}' ({feed_url}): {e}")
+        finally:
+            await http_client.aclose()
+            # 本轮拿到的验证器落盘，下次运行的新实例才能收 304
+            self._save_validators()
 
 # 示例运行 (用于测试)
 async def main():
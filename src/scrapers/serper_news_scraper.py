@@ -1,26 +1,54 @@
-import os
-import requests
+import asyncio
 import json
+import os
 import time
 import logging
+from typing import Optional
+
+import httpx
+
 from src.config import SERPER_API_KEY
 from src.utils import setup_logger
 
 # 初始化 logger
 logger = setup_logger("serper_scraper")
 
+# 进程内结果缓存：同一查询在 TTL 内直接复用上次结果，
+# 既加速重复运行，也省下按量计费的 API 调用
+_SEARCH_CACHE: dict = {}
+SEARCH_CACHE_TTL_SECONDS = int(os.environ.get("SERPER_CACHE_TTL", "3600"))
+
 class SerperNewsScraper:
     def __init__(self):
         if not SERPER_API_KEY:
             raise ValueError("SERPER_API_KEY is not set in environment variables.")
         self.api_key = SERPER_API_KEY
         self.base_url = "https://google.serper.dev/search"
+        self._client: Optional[httpx.AsyncClient] = None
         logger.info("SerperNewsScraper initialized.")
 
-    def search(self, query: str, num: int = 10, max_retries: int = 3) -> list[dict]:
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=10.0)
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def search(self, query: str, num: int = 10, max_retries: int = 3) -> list[dict]:
+        cache_key = (query, num)
+        cached = _SEARCH_CACHE.get(cache_key)
+        if cached is not None:
+            cached_at, cached_results = cached
+            if time.monotonic() - cached_at < SEARCH_CACHE_TTL_SECONDS:
+                logger.info(f"Serper cache hit for query: '{query}' ({len(cached_results)} items)")
+                return cached_results
+
         headers = {
             "X-API-KEY": self.api_key,
-            # requests 库在使用 json= 参数时会自动设置 Content-Type，所以这里不再手动设置，避免冲突
+            # httpx 在使用 json= 参数时会自动设置 Content-Type
         }
         payload = {
             "q": query,
@@ -28,69 +56,87 @@ class SerperNewsScraper:
             "tbm": "nws"  # tbm: type by market, 'nws' for news
         }
 
+        client = self._get_client()
+
         for attempt in range(1, max_retries + 1):
             logger.info(f"Searching news for query: '{query}' (attempt {attempt}/{max_retries})")
             try:
-                # 使用 json= 参数让 requests 自动处理 JSON 序列化和 Content-Type
-                response = requests.post(self.base_url, headers=headers, json=payload, timeout=10)
-                response.raise_for_status()  # 检查并对 4xx/5xx 响应抛出 HTTPError
+                response = await client.post(self.base_url, headers=headers, json=payload)
+                response.raise_for_status()  # 检查并对 4xx/5xx 响应抛出 HTTPStatusError
 
                 data = response.json()
-                logger.info(f"Serper API response data: {data}")
+                # 整包响应可能有几十 KB，只在 DEBUG 级别才序列化输出
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Serper API response data: %s", data)
                 if "organic" in data:
                     logger.info(f"Successfully fetched news for query: '{query}'")
-                    return data["organic"]
+                    results = data["organic"]
+                    _SEARCH_CACHE[cache_key] = (time.monotonic(), results)
+                    return results
                 logger.warning(f"No 'organic' key found in Serper API response for query: '{query}'")
                 return []
 
-            except requests.exceptions.HTTPError as http_err:
-                logger.error(f"HTTP error occurred: {http_err}. Status code: {response.status_code}, Response: {response.text}")
-                if response.status_code == 429:  # Too Many Requests
+            except httpx.HTTPStatusError as http_err:
+                status_code = http_err.response.status_code
+                logger.error(f"HTTP error occurred: {http_err}. Status code: {status_code}, Response: {http_err.response.text}")
+                if status_code == 429:  # Too Many Requests
                     if attempt < max_retries:
-                        wait_time = 2 ** (attempt - 1)  # Exponential backoff
+                        # 服务端给了 Retry-After 就按它等（设上限防止离谱值），
+                        # 没给才退回指数退避——等少了会再次被限流，等多了白耗墙钟
+                        retry_after = http_err.response.headers.get("Retry-After")
+                        if retry_after and retry_after.isdigit():
+                            wait_time = min(int(retry_after), 30)
+                        else:
+                            wait_time = 2 ** (attempt - 1)  # Exponential backoff
                         logger.warning(f"Rate limit hit, retrying in {wait_time} seconds...")
-                        time.sleep(wait_time)
+                        await asyncio.sleep(wait_time)
                         continue
                     else:
                         logger.error("Rate limit hit, max retries reached.")
                         return []
-                elif response.status_code in [400, 401, 403, 404, 405]:
+                elif status_code in [400, 401, 403, 404, 405]:
                     # Bad Request, Unauthorized, Forbidden, Not Found, Method Not Allowed
-                    logger.error(f"Client error ({response.status_code}), no further retries.")
+                    logger.error(f"Client error ({status_code}), no further retries.")
                     return []
                 else:
                     if attempt < max_retries:
                         wait_time = 2 ** (attempt - 1)
-                        logger.warning(f"Server error ({response.status_code}), retrying in {wait_time} seconds...")
-                        time.sleep(wait_time)
+                        logger.warning(f"Server error ({status_code}), retrying in {wait_time} seconds...")
+                        await asyncio.sleep(wait_time)
                         continue
                     else:
-                        logger.error(f"Server error ({response.status_code}), max retries reached.")
+                        logger.error(f"Server error ({status_code}), max retries reached.")
                         return []
-            except requests.exceptions.Timeout:
+            except httpx.TimeoutException:
                 logger.error("Request timed out.")
                 if attempt < max_retries:
                     wait_time = 2 ** (attempt - 1)
                     logger.warning(f"Timeout, retrying in {wait_time} seconds...")
-                    time.sleep(wait_time)
+                    await asyncio.sleep(wait_time)
                     continue
                 else:
                     logger.error("Timeout, max retries reached.")
                     return []
-            except requests.exceptions.RequestException as req_err:
+            except httpx.RequestError as req_err:
                 logger.error(f"An unexpected request error occurred: {req_err}")
                 return []
             except json.JSONDecodeError as json_err:
                 logger.error(f"JSON decode error: {json_err}, Response text: {response.text}")
                 return []
-        
+
         logger.warning(f"Failed to fetch news for query: '{query}' after {max_retries} attempts.")
         return []
 
 if __name__ == "__main__":
-    try:
+    async def _demo():
         scraper = SerperNewsScraper()
-        news_items = scraper.search("科技新闻")
+        try:
+            return await scraper.search("科技新闻")
+        finally:
+            await scraper.aclose()
+
+    try:
+        news_items = asyncio.run(_demo())
         if news_items:
             print("\n--- Fetched News Items (First 3) ---")
             for i, item in enumerate(news_items[:3]):
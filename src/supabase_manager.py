@@ -1,16 +1,94 @@
+import asyncio
+import functools
 import logging
 import json
-from typing import List, Dict, Any, Tuple, Set
-from datetime import datetime, timedelta
+import os
+import threading
+from typing import List, Dict, Any, Optional, Tuple, Set
+from datetime import datetime, timedelta, timezone
 
 import httpx
 from supabase import create_client, Client
 
+# orjson 序列化/解析大 payload 明显快于标准库；未安装时退回 stdlib json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_json_loads = orjson.loads if orjson else json.loads
+
+# HTTP/2 能在一条连接上多路复用并发请求；httpx 需要可选依赖 h2，
+# 未安装时退回 HTTP/1.1 + keep-alive
+try:
+    import h2  # noqa: F401
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
+
 from src.data_models import Article
 from src.config import settings
+from src.utils import IN_FILTER_CHUNK
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG if settings.DEBUG else logging.INFO)
+
+# 每次 REST upsert 的行数上限：单次全量请求体过大容易超时，
+# 逐条请求又会为每行付一次 HTTP 往返，按大批次切分折中两者。
+# 可通过环境变量按部署调整（行宽差异大时 200 不一定是最优值）
+UPSERT_BATCH_SIZE = int(os.environ.get("SUPABASE_UPSERT_BATCH", "200"))
+
+# 置 1 后 upsert 前先查库里已有哪些 link，只上传真正的新行。
+# 重复抓同一批源时能省掉大量出站流量；但已存在的行不会再被更新，
+# 所以默认关闭（NLP 补全等场景依赖 merge-duplicates 的更新语义）
+SKIP_EXISTING_LINKS = os.environ.get("SUPABASE_SKIP_EXISTING", "0") == "1"
+
+# 单次 in_() 预查询的 link 数上限：in 过滤走查询串，份量大了网关直接
+# 按 URI 超长拒掉；与 utils.select_in 共用同一个按 URI 预算定的值
+_EXISTING_CHECK_CHUNK = IN_FILTER_CHUNK
+
+# 异步 upsert 时同时在途的分块请求数；别开太大，Supabase pooler 有连接上限
+UPSERT_CONCURRENCY = int(os.environ.get("SUPABASE_UPSERT_CONCURRENCY", "4"))
+
+# 连接池尺寸按部署可调：连接太多会顶到 Supabase 的连接上限
+# （"Max client connections reached"），太少并发请求排队空等
+_POOL_MAX = int(os.environ.get("SUPABASE_POOL_MAX", "20"))
+_POOL_KEEPALIVE = int(os.environ.get("SUPABASE_POOL_KEEPALIVE", "10"))
+_POOL_KEEPALIVE_EXPIRY = float(os.environ.get("SUPABASE_POOL_KEEPALIVE_EXPIRY", "60"))
+_HTTP_LIMITS = httpx.Limits(
+    max_connections=_POOL_MAX,
+    max_keepalive_connections=_POOL_KEEPALIVE,
+    keepalive_expiry=_POOL_KEEPALIVE_EXPIRY,
+)
+
+# 可能以字符串形式返回、需要解码回 Python 结构的 jsonb 列
+_JSONB_FIELDS = ("tags", "main_tags", "entities", "authors", "sentiment", "key_points")
+
+# jsonb 列 -> 期望容器类型；替代逐字段 if/isinstance 的分支串
+_JSONB_COERCERS = {
+    "tags": list,
+    "main_tags": list,
+    "authors": list,
+    "key_points": list,
+    "entities": dict,
+    "sentiment": dict,
+}
+
+# pydantic 版本只在导入时判断一次，不在每篇文章转换时重复 hasattr
+_HAS_MODEL_DUMP = hasattr(Article, "model_dump")
+
+# pydantic v2 的 TypeAdapter 可以一次校验整个列表（共享编译好的校验器），
+# 比逐行 Article(**item) 快得多；v1 环境下构造会失败，保持 None 走逐行路径
+try:
+    from pydantic import TypeAdapter
+    _ARTICLE_LIST_ADAPTER = TypeAdapter(List[Article])
+except Exception:
+    _ARTICLE_LIST_ADAPTER = None
+
+
+@functools.lru_cache(maxsize=None)
+def _create_supabase_client(url: str, key: str) -> Client:
+    """同一 (url, key) 只构建一次客户端：create_client 每次都新建 httpx 连接池。"""
+    return create_client(url, key)
 
 
 class SupabaseManager:
@@ -37,19 +115,53 @@ class SupabaseManager:
         if not self.supabase_url or not self.supabase_key or not self.table_name:
             raise ValueError("Supabase configuration is incomplete.")
 
-        self.client: Client = create_client(self.supabase_url, self.supabase_key)
+        self.client: Client = _create_supabase_client(self.supabase_url, self.supabase_key)
         logger.info(f"Supabase client initialized successfully with {key_type} key.")
 
+        # REST 直连（upsert / 表结构探测）共用一个持久化客户端：
+        # 复用到 Supabase 的 TLS 连接，不再每次请求重新握手
+        self._http = httpx.Client(
+            timeout=20,
+            http2=_HTTP2_AVAILABLE,
+            limits=_HTTP_LIMITS,
+        )
+
         self.allowed_columns: Set[str] = self._fetch_table_columns()
 
+    def close(self) -> None:
+        """关闭持久化 REST 客户端，释放池内连接（幂等）。"""
+        self._http.close()
+
+    def __enter__(self) -> "SupabaseManager":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def warm_connection(self) -> None:
+        """后台预热 ``self._http`` 池里到 Supabase 的 TLS 连接。
+
+        upsert / 表结构探测都走这个池；启动阶段先用一个廉价 HEAD 把
+        握手做掉，第一笔真实请求就能直接复用连接。失败只记日志。
+        """
+        def _warm() -> None:
+            try:
+                base_url = self.supabase_url.replace("http://", "https://").rstrip("/")
+                self._http.head(f"{base_url}/rest/v1/", headers={"apikey": self.supabase_key}, timeout=5)
+            except Exception as e:
+                logger.debug("Supabase connection warmup failed: %s", e)
+
+        threading.Thread(target=_warm, name="supabase-warmup", daemon=True).start()
+
     def _fetch_table_columns(self) -> Set[str]:
         """Fetch table schema from PostgREST OpenAPI and cache allowed columns."""
         try:
             base_url = self.supabase_url.replace("http://", "https://").rstrip("/")
             openapi_url = f"{base_url}/rest/v1/?apikey={self.supabase_key}"
-            resp = httpx.get(openapi_url, timeout=10)
+            resp = self._http.get(openapi_url, timeout=10)
             resp.raise_for_status()
-            openapi = resp.json()
+            # OpenAPI 文档可达数百 KB，orjson 解码明显快于 resp.json()
+            openapi = _json_loads(resp.content)
             definition = openapi.get("definitions", {}).get(self.table_name, {})
             props = definition.get("properties", {})
             columns = set(props.keys())
@@ -62,20 +174,59 @@ class SupabaseManager:
             logger.warning(f"Failed to fetch Supabase schema, skip column filtering: {e}")
             return set()
 
+    @staticmethod
+    def _rows_to_articles(rows: List[Dict[str, Any]], warn_label: str) -> List[Article]:
+        """把已预处理的行批量转成 Article。
+
+        有 TypeAdapter 时先整批校验（单次调用）；整批失败（个别脏行）或
+        v1 环境下退回逐行转换，保留"坏行只跳过不拖垮整批"的语义。
+        """
+        if _ARTICLE_LIST_ADAPTER is not None:
+            try:
+                return _ARTICLE_LIST_ADAPTER.validate_python(rows)
+            except Exception:
+                pass
+        articles: List[Article] = []
+        for item in rows:
+            try:
+                articles.append(Article(**item))
+            except Exception as e:
+                logger.warning("Failed to parse %s from Supabase: %s", warn_label, e)
+        return articles
+
+    @staticmethod
+    def _decode_jsonb_fields(item: Dict[str, Any]) -> None:
+        """把以字符串形式返回的 jsonb 列就地解码（两个 fetch 方法共用）。"""
+        for field in _JSONB_FIELDS:
+            value = item.get(field)
+            if isinstance(value, str):
+                try:
+                    item[field] = _json_loads(value)
+                except Exception:
+                    pass
+
     def _filter_payload(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         if not self.allowed_columns:
             return payload
         filtered = {k: v for k, v in payload.items() if k in self.allowed_columns}
-        dropped = set(payload.keys()) - set(filtered.keys())
-        if dropped:
-            logger.debug(f"Dropped fields not in table schema: {sorted(dropped)}")
+        # set 差集 + sorted 只在真的会输出 DEBUG 时才算
+        if logger.isEnabledFor(logging.DEBUG):
+            dropped = payload.keys() - filtered.keys()
+            if dropped:
+                logger.debug("Dropped fields not in table schema: %s", sorted(dropped))
         return filtered
 
     def _article_to_dict(self, article: Article) -> Dict[str, Any]:
-        if hasattr(article, "model_dump"):
-            article_dict = article.model_dump()
-        else:
-            article_dict = article.dict()
+        if _HAS_MODEL_DUMP:
+            # pydantic v2：mode="json" 一趟完成 HttpUrl 转字符串、datetime 转
+            # ISO 格式和容器 JSON 化，后面的逐字段矫正全部省掉
+            article_dict = article.model_dump(mode="json")
+            if not article_dict.get("id") and article_dict.get("link"):
+                import uuid
+                article_dict["id"] = str(uuid.uuid4())
+            return article_dict
+
+        article_dict = article.dict()
 
         if article_dict.get("link"):
             article_dict["link"] = str(article_dict["link"])
@@ -90,106 +241,185 @@ class SupabaseManager:
             if article_dict.get(dt_field) and hasattr(article_dict[dt_field], "isoformat"):
                 article_dict[dt_field] = article_dict[dt_field].isoformat()
 
-        jsonb_fields = ["tags", "main_tags", "entities", "authors", "sentiment", "key_points"]
-        for field in jsonb_fields:
-            if field in article_dict and article_dict[field] is None:
-                continue
-            if field in ["tags", "main_tags", "authors", "key_points"] and not isinstance(article_dict.get(field, []), list):
-                article_dict[field] = list(article_dict[field]) if article_dict[field] else []
-            if field in ["entities", "sentiment"] and not isinstance(article_dict.get(field, {}), dict):
-                article_dict[field] = dict(article_dict[field]) if article_dict[field] else {}
+        for field, container in _JSONB_COERCERS.items():
+            value = article_dict.get(field)
+            if value is not None and not isinstance(value, container):
+                article_dict[field] = container(value) if value else container()
 
         return article_dict
 
-    def _rest_upsert(self, payload: List[Dict[str, Any]]) -> Tuple[int, int]:
+    def _article_to_payload(self, article: Article) -> Optional[Dict[str, Any]]:
+        """转换 + 列过滤合成一步；单条转换失败返回 None，不拖垮整批。"""
+        try:
+            return self._filter_payload(self._article_to_dict(article))
+        except Exception as e:
+            logger.warning("Skip article due to conversion error: %s", e)
+            return None
+
+    def _upsert_request_parts(self) -> Tuple[str, Dict[str, str]]:
+        """同步/异步 upsert 共用的 URL 与请求头。"""
         base_url = self.supabase_url.replace("http://", "https://").rstrip("/")
-        url = f"{base_url}/rest/v1/{self.table_name}?on_conflict=link"
+        # select=id 把 return=representation 的回包缩成每行一个 id：
+        # 保留行数统计的同时，不再让 Postgres 把整行 JSON 序列化回来
+        url = f"{base_url}/rest/v1/{self.table_name}?on_conflict=link&select=id"
         headers = {
             "apikey": self.supabase_key,
             "Authorization": f"Bearer {self.supabase_key}",
             "Content-Type": "application/json",
             "Prefer": "resolution=merge-duplicates,return=representation",
         }
-        resp = httpx.post(url, headers=headers, json=payload, timeout=20)
+        return url, headers
+
+    @staticmethod
+    def _parse_upsert_response(resp: httpx.Response, chunk_len: int) -> Tuple[int, int]:
         if resp.status_code not in (200, 201):
-            logger.error(f"Supabase upsert failed: {resp.status_code} {resp.text}")
-            return 0, len(payload)
+            logger.error("Supabase upsert failed: %s %s", resp.status_code, resp.text)
+            return 0, chunk_len
         try:
-            data = resp.json()
+            data = _json_loads(resp.content)
         except Exception:
             data = []
         inserted = len(data) if isinstance(data, list) else 0
-        skipped = len(payload) - inserted
-        return inserted, skipped
+        return inserted, chunk_len - inserted
+
+    def _rest_upsert(self, payload: List[Dict[str, Any]]) -> Tuple[int, int]:
+        url, headers = self._upsert_request_parts()
+        if orjson is not None:
+            resp = self._http.post(url, headers=headers, content=orjson.dumps(payload))
+        else:
+            resp = self._http.post(url, headers=headers, json=payload)
+        return self._parse_upsert_response(resp, len(payload))
+
+    def _fetch_existing_links(self, links: List[str]) -> Set[str]:
+        """查出给定 link 中哪些已在库里；查询失败时返回空集（不拦截 upsert）。"""
+        existing: Set[str] = set()
+        try:
+            for i in range(0, len(links), _EXISTING_CHECK_CHUNK):
+                chunk = links[i:i + _EXISTING_CHECK_CHUNK]
+                response = self.client.table(self.table_name) \
+                    .select("link") \
+                    .in_("link", chunk) \
+                    .execute()
+                if hasattr(response, "data") and response.data:
+                    existing.update(row["link"] for row in response.data if row.get("link"))
+        except Exception as e:
+            logger.warning("Existing-link pre-check failed, upserting full batch: %s", e)
+            return set()
+        return existing
+
+    def _build_upsert_payload(self, articles: List[Article]) -> Tuple[List[Dict[str, Any]], int]:
+        """去重 + 转换 + 列过滤（+ 可选已存在预查）。
+
+        返回 (payload, 空载时应报告的 skipped 数)，同步/异步 upsert 共用。
+        """
+        # dict 按 link 一遍去重（保留首次出现的文章）；
+        # link_str 用 Article 上缓存的字符串，避免重复渲染 HttpUrl
+        unique_by_link: Dict[str, Article] = {}
+        for article in articles:
+            if article.link:
+                unique_by_link.setdefault(article.link_str, article)
+
+        if not unique_by_link:
+            return [], len(articles)
+
+        # 去重结果直接喂进转换+过滤的单趟推导式，
+        # 不再落一个中间 unique_articles 列表
+        payload = [
+            p
+            for p in map(self._article_to_payload, unique_by_link.values())
+            if p is not None
+        ]
+
+        if payload and SKIP_EXISTING_LINKS:
+            existing = self._fetch_existing_links([p["link"] for p in payload if p.get("link")])
+            if existing:
+                before = len(payload)
+                payload = [p for p in payload if p.get("link") not in existing]
+                logger.info(f"Skipping {before - len(payload)} articles already in Supabase.")
+
+        return payload, len(unique_by_link)
 
     def upsert_articles(self, articles: List[Article]) -> Tuple[int, int]:
         if not articles:
             return 0, 0
 
-        seen = set()
-        unique_articles = []
-        for article in articles:
-            link_str = str(article.link) if article.link else None
-            if not link_str:
-                continue
-            if link_str in seen:
-                continue
-            seen.add(link_str)
-            unique_articles.append(article)
-
-        if not unique_articles:
-            return 0, len(articles)
-
-        payload = []
-        for article in unique_articles:
-            try:
-                article_dict = self._article_to_dict(article)
-                article_dict = self._filter_payload(article_dict)
-                payload.append(article_dict)
-            except Exception as e:
-                logger.warning(f"Skip article due to conversion error: {e}")
+        payload, skipped_if_empty = self._build_upsert_payload(articles)
+        if not payload:
+            return 0, skipped_if_empty
+
+        total_inserted = 0
+        total_skipped = 0
+        for i in range(0, len(payload), UPSERT_BATCH_SIZE):
+            inserted, skipped = self._rest_upsert(payload[i:i + UPSERT_BATCH_SIZE])
+            total_inserted += inserted
+            total_skipped += skipped
+        return total_inserted, total_skipped
+
+    async def upsert_articles_async(self, articles: List[Article]) -> Tuple[int, int]:
+        """异步版 upsert：各分块并发发送，受信号量限流。
 
+        顺序逐块 upsert 会串行化每次 HTTP 往返；大批量时并发分块能把
+        墙钟时间压到接近单块耗时。同步调用方继续用 upsert_articles。
+        """
+        if not articles:
+            return 0, 0
+
+        # 转换/校验是 CPU 密集的，放到线程里做，不阻塞事件循环
+        payload, skipped_if_empty = await asyncio.to_thread(self._build_upsert_payload, articles)
         if not payload:
-            return 0, len(unique_articles)
+            return 0, skipped_if_empty
+
+        url, headers = self._upsert_request_parts()
+        semaphore = asyncio.Semaphore(UPSERT_CONCURRENCY)
+
+        async with httpx.AsyncClient(timeout=20, http2=_HTTP2_AVAILABLE, limits=_HTTP_LIMITS) as client:
+            async def _send(chunk: List[Dict[str, Any]]) -> Tuple[int, int]:
+                async with semaphore:
+                    if orjson is not None:
+                        resp = await client.post(url, headers=headers, content=orjson.dumps(chunk))
+                    else:
+                        resp = await client.post(url, headers=headers, json=chunk)
+                return self._parse_upsert_response(resp, len(chunk))
+
+            results = await asyncio.gather(*(
+                _send(payload[i:i + UPSERT_BATCH_SIZE])
+                for i in range(0, len(payload), UPSERT_BATCH_SIZE)
+            ))
 
-        return self._rest_upsert(payload)
+        total_inserted = sum(inserted for inserted, _ in results)
+        total_skipped = sum(skipped for _, skipped in results)
+        return total_inserted, total_skipped
 
     def fetch_articles(self, limit: int = 100, days_ago: int = 7) -> List[Article]:
-        cutoff_date = datetime.utcnow() - timedelta(days=days_ago)
+        # utcnow() 已废弃且返回 naive 时间；now/cutoff 每次调用只算一次
+        now_utc = datetime.now(timezone.utc)
+        cutoff_iso = (now_utc - timedelta(days=days_ago)).isoformat()
         response = self.client.table(self.table_name) \
             .select("*") \
-            .gte("published", cutoff_date.isoformat()) \
+            .gte("published", cutoff_iso) \
             .order("published", desc=True) \
             .limit(limit) \
             .execute()
 
-        articles: List[Article] = []
-        if hasattr(response, "data") and response.data:
-            for item in response.data:
-                for field in ["tags", "main_tags", "entities", "authors", "sentiment", "key_points"]:
-                    if field in item and isinstance(item[field], str):
-                        try:
-                            item[field] = json.loads(item[field])
-                        except Exception:
-                            pass
-                
-                # 确保必填字段有默认值
-                if 'source' not in item or not item['source']:
-                    item['source'] = "Unknown Source"
-                if 'key_points' not in item or item['key_points'] is None:
-                    item['key_points'] = []
-                if 'title' not in item:
-                    item['title'] = "No Title"
-                if 'link' not in item:
-                    item['link'] = "https://example.com"
-                if 'published' not in item:
-                    item['published'] = datetime.utcnow()
-                
-                try:
-                    articles.append(Article(**item))
-                except Exception as e:
-                    logger.warning(f"Failed to parse article from Supabase: {e}")
-        return articles
+        if not (hasattr(response, "data") and response.data):
+            return []
+
+        for item in response.data:
+            self._decode_jsonb_fields(item)
+
+            # 确保必填字段有默认值
+            if 'source' not in item or not item['source']:
+                item['source'] = "Unknown Source"
+            if 'key_points' not in item or item['key_points'] is None:
+                item['key_points'] = []
+            if 'title' not in item:
+                item['title'] = "No Title"
+            if 'link' not in item:
+                item['link'] = "https://example.com"
+            if 'published' not in item:
+                item['published'] = now_utc
+
+        return self._rows_to_articles(response.data, "article")
 
     def fetch_favorites_needing_analysis(self, limit: int = 50) -> List[Article]:
         response = self.client.table(self.table_name) \
@@ -200,20 +430,11 @@ class SupabaseManager:
             .limit(limit) \
             .execute()
 
-        articles: List[Article] = []
-        if hasattr(response, "data") and response.data:
-            for item in response.data:
-                for field in ["tags", "main_tags", "entities", "authors", "sentiment", "key_points"]:
-                    if field in item and isinstance(item[field], str):
-                        try:
-                            item[field] = json.loads(item[field])
-                        except Exception:
-                            pass
-                try:
-                    articles.append(Article(**item))
-                except Exception as e:
-                    logger.warning(f"Failed to parse favorite article: {e}")
-        return articles
+        if not (hasattr(response, "data") and response.data):
+            return []
+        for item in response.data:
+            self._decode_jsonb_fields(item)
+        return self._rows_to_articles(response.data, "favorite article")
 
     def update_favorite_analysis(self, article_id: str, analysis: str) -> None:
         self.client.table(self.table_name).update({"favorite_analysis": analysis}).eq("id", article_id).execute()
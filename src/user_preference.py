@@ -2,7 +2,7 @@
 from dataclasses import dataclass, field
 from typing import List
 
-@dataclass
+@dataclass(slots=True)
 class UserPreference:
     """
     用户偏好数据模型。
@@ -1,12 +1,56 @@
 """
 工具模块：Supabase 连接器、日志设置、API 请求封装
 """
+import asyncio
 import logging
 import sys
-from typing import Optional
-from supabase import create_client, Client
+import threading
+from typing import Optional, TYPE_CHECKING
 from src.config import SUPABASE_URL, SUPABASE_KEY
 
+# supabase 会连带拖进 postgrest/gotrue/storage3/realtime，导入要几百毫秒；
+# 推迟到第一次真的要建客户端时再 import，只用 setup_logger 的脚本不用买单
+if TYPE_CHECKING:
+    from supabase import AsyncClient, Client
+
+# 单次 in.(...) 过滤允许携带的值数量：PostgREST 的 in 过滤走查询串，
+# 值一多 URI 就超过网关限制（按 8KB URI 预算，百余字符的长 URL 也装得下 50 个）
+IN_FILTER_CHUNK = 50
+
+# 配置有效性在导入时判定一次；不在这里直接 raise，
+# 只用 setup_logger 的调用方不该因为缺 Supabase 配置而挂掉
+_SUPABASE_CONFIG_OK = bool(SUPABASE_URL and SUPABASE_KEY)
+
+# 进程级单例：create_client 每次都会新建 httpx 客户端和 TLS 连接池，
+# 所有调用方共享同一个实例才能复用连接
+_supabase_client: Optional["Client"] = None
+_supabase_client_lock = threading.Lock()
+
+# 异步客户端单例：同一事件循环内的并发查询共享一个连接池，
+# 配合 asyncio.gather 把 N 次查询的墙钟压到约等于最慢一次
+_supabase_async_client: Optional["AsyncClient"] = None
+_supabase_async_client_lock = asyncio.Lock()
+
+# 已配置过的 logger 缓存：命中后直接返回，
+# 跳过 getLogger 的内部锁和 handlers 检查
+_LOGGERS: dict = {}
+
+# 格式器无状态，构建一次全体共用
+_LOG_FORMATTER = logging.Formatter(
+    '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+# 格式串里用不到线程/进程字段，关掉采集省去每条记录的额外查询
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+
+# 所有命名 logger 共用一个控制台 handler：
+# 每个名字各建一个 handler 等于每条日志多一把锁、stdout 上多一路竞争
+_SHARED_HANDLER = logging.StreamHandler(sys.stdout)
+_SHARED_HANDLER.setFormatter(_LOG_FORMATTER)
+
 
 def setup_logger(name: str = "daily_news_system", level: int = logging.INFO) -> logging.Logger:
     """
@@ -19,50 +63,113 @@ def setup_logger(name: str = "daily_news_system", level: int = logging.INFO) ->
     Returns:
         配置好的 logging.Logger 实例
     """
+    cached = _LOGGERS.get(name)
+    if cached is not None:
+        return cached
+
     logger = logging.getLogger(name)
-    
-    # 避免重复添加 handler
-    if logger.handlers:
-        return logger
-    
-    logger.setLevel(level)
-    
-    # 创建控制台 handler
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(level)
-    
-    # 创建格式器
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    console_handler.setFormatter(formatter)
-    
-    # 添加 handler 到 logger
-    logger.addHandler(console_handler)
-    
+
+    # 避免重复添加 handler（比如入口已通过 dictConfig 配置过）
+    if not logger.handlers:
+        logger.setLevel(level)
+
+        # 挂共享 handler，不再为每个名字各造一个
+        logger.addHandler(_SHARED_HANDLER)
+
+        # 有了自己的 handler 就不再向 root 传播，
+        # 避免根 handler 把同一条记录再格式化/输出一遍
+        logger.propagate = False
+
+    _LOGGERS[name] = logger
     return logger
 
 
-def get_supabase_client() -> Optional[Client]:
+def get_supabase_client() -> Optional["Client"]:
     """
-    创建并返回 Supabase 客户端实例
-    
+    返回进程级共享的 Supabase 客户端实例（首次调用时创建）
+
     Returns:
-        Supabase Client 实例，如果连接失败则返回 None
-        
+        Supabase Client 实例
+
     Raises:
-        Exception: 如果配置无效或连接失败
+        ValueError: 配置缺失；create_client 的失败原样抛出
     """
-    try:
-        if not SUPABASE_URL or not SUPABASE_KEY:
-            raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set")
-        
-        client = create_client(SUPABASE_URL, SUPABASE_KEY)
-        
-        # 尝试一个简单的查询来验证连接
-        # 这里只是创建客户端，不进行实际查询，避免不必要的 API 调用
-        return client
-        
-    except Exception as e:
-        raise Exception(f"Failed to create Supabase client: {str(e)}") from e
+    global _supabase_client
+    if _supabase_client is not None:
+        return _supabase_client
+
+    if not _SUPABASE_CONFIG_OK:
+        raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set")
+
+    # 双重检查锁：多线程首次并发调用时也只构建一次
+    with _supabase_client_lock:
+        if _supabase_client is None:
+            from supabase import create_client
+
+            # 只创建客户端，不进行实际查询，避免不必要的 API 调用
+            _supabase_client = create_client(SUPABASE_URL, SUPABASE_KEY)
+        return _supabase_client
+
+
+def select_in(table: str, column: str, values, select: str = "*") -> list:
+    """用 ``in.(...)`` 过滤批量取行。
+
+    替代对每个值单独 ``.eq()`` 的 N+1 循环：N 次 Kong+TLS 往返变成
+    ceil(N / IN_FILTER_CHUNK) 次。值按 URI 预算分块，整批塞进一个
+    查询串会被网关按 URI 超长拒掉。
+    """
+    client = get_supabase_client()
+    values = list(values)
+    rows: list = []
+    for i in range(0, len(values), IN_FILTER_CHUNK):
+        response = client.table(table).select(select).in_(column, values[i:i + IN_FILTER_CHUNK]).execute()
+        rows.extend(response.data or [])
+    return rows
+
+
+async def get_async_supabase_client() -> "AsyncClient":
+    """返回进程级共享的异步 Supabase 客户端（首次 await 时创建）。
+
+    调用方可以用 ``asyncio.gather`` 在同一个客户端上并发发请求，
+    不再被同步 Client 逐条串行化。
+    """
+    global _supabase_async_client
+    if _supabase_async_client is not None:
+        return _supabase_async_client
+
+    if not _SUPABASE_CONFIG_OK:
+        raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set")
+
+    async with _supabase_async_client_lock:
+        if _supabase_async_client is None:
+            from supabase import acreate_client
+
+            _supabase_async_client = await acreate_client(SUPABASE_URL, SUPABASE_KEY)
+        return _supabase_async_client
+
+
+def warm_supabase_connection() -> None:
+    """后台把本模块的单例客户端提前构建掉。
+
+    supabase SDK 的导入+初始化不便宜，放到后台线程与应用启动重叠。
+    注意这只预热 utils 的单例；走 SupabaseManager 的调用方应当用
+    ``SupabaseManager.warm_connection()`` 预热它自己的连接池。
+    失败只记日志——预热只是优化，不能挡住主流程。
+    """
+    if not _SUPABASE_CONFIG_OK:
+        return
+
+    def _warm() -> None:
+        try:
+            get_supabase_client()
+        except Exception as e:
+            logging.getLogger(__name__).debug("Supabase warmup failed: %s", e)
+
+    threading.Thread(target=_warm, name="supabase-warmup", daemon=True).start()
+
+
+def reset_supabase_client() -> None:
+    """丢弃缓存的客户端（主要给测试 / 凭据轮换用）。"""
+    global _supabase_client
+    with _supabase_client_lock:
+        _supabase_client = None